@@ -3,41 +3,122 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional
 import os
 import logging
-from .config import get_firebase_credentials
+import threading
+from .config import settings, get_firebase_credentials, get_auth_test_public_key
+from .models import User
 
 logger = logging.getLogger(__name__)
 
-try:
-    import firebase_admin
-    from firebase_admin import credentials, auth
-    from .models import User
+# Firebase Admin SDK is imported and initialized on first use, not at import time
+_firebase_auth = None
+_firebase_lock = threading.Lock()
+
+def get_firebase_auth():
+    """
+    Initialize the Firebase Admin SDK on first use and return its auth module.
+    """
+    global _firebase_auth
+    if _firebase_auth is not None:
+        return _firebase_auth
     
-    # Initialize Firebase Admin SDK
-    if not firebase_admin._apps:
-        firebase_creds = get_firebase_credentials()
+    with _firebase_lock:
+        if _firebase_auth is not None:
+            return _firebase_auth
+        
+        try:
+            import firebase_admin
+            from firebase_admin import credentials, auth
+        except ImportError:
+            logger.error("Firebase Admin SDK not available - authentication required for production")
+            raise ImportError("Firebase Admin SDK is required for production")
         
-        if firebase_creds:
-            # Use service account credentials
-            cred = credentials.Certificate(firebase_creds)
-            firebase_admin.initialize_app(cred)
-            logger.info("Firebase Admin SDK initialized with service account credentials")
-        else:
-            # Try default credentials as fallback
-            try:
-                firebase_admin.initialize_app()
-                logger.info("Firebase Admin SDK initialized with default credentials")
-            except Exception as e:
-                logger.error(f"Could not initialize Firebase Admin SDK: {e}")
-                raise Exception("Firebase authentication is required for production")
+        # Initialize Firebase Admin SDK
+        if not firebase_admin._apps:
+            firebase_creds = get_firebase_credentials()
+            
+            if firebase_creds:
+                # Use service account credentials
+                try:
+                    cred = credentials.Certificate(firebase_creds)
+                    firebase_admin.initialize_app(cred)
+                except Exception as e:
+                    logger.error(f"Firebase initialization failed: {e}")
+                    raise Exception("Firebase authentication setup failed")
+                logger.info("Firebase Admin SDK initialized with service account credentials")
+            else:
+                # Try default credentials as fallback
+                try:
+                    firebase_admin.initialize_app()
+                    logger.info("Firebase Admin SDK initialized with default credentials")
+                except Exception as e:
+                    logger.error(f"Could not initialize Firebase Admin SDK: {e}")
+                    raise Exception("Firebase authentication is required for production")
+        
+        _firebase_auth = auth
     
-    FIREBASE_AVAILABLE = True
+    return _firebase_auth
+
+def _require_firebase_auth():
+    """Firebase auth module, or a 503 if the SDK cannot be initialized"""
+    try:
+        return get_firebase_auth()
+    except Exception as e:
+        logger.error(f"Authentication service unavailable: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="Authentication service unavailable"
+        )
+
+class ExpiredTokenError(Exception):
+    pass
+
+class InvalidTokenError(Exception):
+    pass
+
+def _verify_test_token(token: str) -> dict:
+    """
+    Verify a token signed by the local load-test key (auth test mode only).
+    """
+    from jose import jwt, ExpiredSignatureError, JWTError
+    
+    public_key = get_auth_test_public_key()
+    if not public_key:
+        raise Exception("AUTH_TEST_MODE is enabled but AUTH_TEST_PUBLIC_KEY is not set")
     
-except ImportError:
-    logger.error("Firebase Admin SDK not available - authentication required for production")
-    raise ImportError("Firebase Admin SDK is required for production")
-except Exception as e:
-    logger.error(f"Firebase initialization failed: {e}")
-    raise Exception("Firebase authentication setup failed")
+    try:
+        claims = jwt.decode(
+            token,
+            public_key,
+            algorithms=["RS256"],
+            audience=settings.auth_test_audience,
+            issuer=settings.auth_test_issuer
+        )
+    except ExpiredSignatureError:
+        raise ExpiredTokenError()
+    except JWTError as e:
+        raise InvalidTokenError(str(e))
+    
+    # Firebase exposes the subject as uid
+    claims['uid'] = claims['sub']
+    return claims
+
+def verify_id_token(token: str) -> dict:
+    """
+    Verify an ID token and return its decoded claims.
+    Uses Firebase, or the local test key when auth test mode is enabled.
+    """
+    if settings.auth_test_mode:
+        return _verify_test_token(token)
+    
+    auth = _require_firebase_auth()
+    
+    try:
+        return auth.verify_id_token(token)
+    except auth.ExpiredIdTokenError:
+        # Subclass of InvalidIdTokenError, so it must be handled first
+        raise ExpiredTokenError()
+    except auth.InvalidIdTokenError as e:
+        raise InvalidTokenError(str(e))
 
 security = HTTPBearer(auto_error=True)
 
@@ -55,7 +136,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     
     try:
         # Verify the token with Firebase
-        decoded_token = auth.verify_id_token(credentials.credentials)
+        decoded_token = verify_id_token(credentials.credentials)
         
         return User(
             uid=decoded_token['uid'],
@@ -63,13 +144,15 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             name=decoded_token.get('name')
         )
         
-    except auth.ExpiredIdTokenError:
+    except HTTPException:
+        raise
+    except ExpiredTokenError:
         raise HTTPException(
             status_code=401,
             detail="Authentication token expired",
             headers={"WWW-Authenticate": "Bearer"}
         )
-    except auth.InvalidIdTokenError:
+    except InvalidTokenError:
         raise HTTPException(
             status_code=401,
             detail="Invalid authentication token",
@@ -98,11 +181,13 @@ async def get_optional_user(credentials: Optional[HTTPAuthorizationCredentials]
         return None
     
     try:
-        decoded_token = auth.verify_id_token(credentials.credentials)
+        decoded_token = verify_id_token(credentials.credentials)
         return User(
             uid=decoded_token['uid'],
             email=decoded_token.get('email'),
             name=decoded_token.get('name')
         )
+    except HTTPException:
+        raise
     except Exception:
         return None 
\ No newline at end of file
@@ -1,5 +1,5 @@
 import os
-from typing import List
+from typing import Dict, List
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -25,6 +25,79 @@ class Settings(BaseSettings):
     firebase_auth_uri: str = "https://accounts.google.com/o/oauth2/auth"
     firebase_token_uri: str = "https://oauth2.googleapis.com/token"
     
+    # Load the model in the background at startup instead of on the first request
+    preload_model: bool = True
+    # Backoff between attempts after a failed model load (seconds, doubling up to the max)
+    model_load_retry_initial: float = 5.0
+    model_load_retry_max: float = 300.0
+    
+    # Canvas ingest: canvases with less ink than this are rejected without a model call
+    canvas_min_ink_coverage: float = 0.001
+    canvas_min_ink_pixels: int = 30
+    # Minimum per-channel difference from the background to count as ink (0-255)
+    canvas_ink_threshold: int = 32
+    # Margin around the inked region, as a fraction of its longer side
+    canvas_crop_margin: float = 0.1
+    
+    # Near-duplicate reuse: serve stored scores for a user's drawing whose
+    # perceptual hash (736 bits) is within dedup_max_distance bits of an earlier one
+    dedup_enabled: bool = True
+    dedup_max_distance: int = 6
+    dedup_max_entries: int = 10000
+    # Fraction of hits that still run the model, to measure reuse accuracy
+    dedup_verify_rate: float = 0.0
+    
+    # Inference scheduling
+    inference_max_concurrency: int = 2
+    inference_max_queue_per_user: int = 16
+    inference_queue_timeout: float = 30.0
+    # Priority classes, served by weighted fair scheduling (higher weight = larger share)
+    scheduler_class_weights: Dict[str, int] = {
+        "interactive": 8,
+        "batch": 2,
+        "anonymous": 1
+    }
+    scheduler_class_concurrency: Dict[str, int] = {
+        "interactive": 2,
+        "batch": 1,
+        "anonymous": 1
+    }
+    # Token-bucket rate limits per queue (requests per second and burst size)
+    scheduler_class_rate: Dict[str, float] = {
+        "interactive": 5.0,
+        "batch": 2.0,
+        "anonymous": 1.0
+    }
+    scheduler_class_burst: Dict[str, int] = {
+        "interactive": 10,
+        "batch": 20,
+        "anonymous": 5
+    }
+    # Upper bound on tracked buckets; idle ones are dropped once refilled
+    scheduler_max_buckets: int = 10000
+    
+    # Auth test mode: trust ID tokens signed by a local key (load testing only)
+    auth_test_mode: bool = False
+    auth_test_public_key: str = ""
+    auth_test_issuer: str = "art-therapy-load-test"
+    auth_test_audience: str = "art-therapy-api"
+    
+    # Overload control: degrade through quality tiers to keep p99 latency within the SLO
+    overload_enabled: bool = True
+    overload_slo_p99_ms: float = 2000.0
+    overload_queue_high: int = 8
+    overload_queue_low: int = 2
+    overload_recover_ratio: float = 0.5
+    overload_escalate_interval: float = 2.0
+    overload_recover_interval: float = 15.0
+    overload_latency_window: float = 30.0
+    # Highest tier the controller may reach (0 full ... 4 cached or heuristic only)
+    overload_max_tier: int = 4
+    # Queue timeout for requests served at the short-queue tier and above
+    overload_short_queue_timeout: float = 5.0
+    # Wider near-duplicate distance accepted when serving without the model
+    overload_fallback_distance: int = 12
+    
     # Logging
     log_level: str = "INFO"
     
@@ -51,4 +124,8 @@ def get_firebase_credentials() -> dict:
         "token_uri": settings.firebase_token_uri,
         "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
         "client_x509_cert_url": f"https://www.googleapis.com/robot/v1/metadata/x509/{settings.firebase_client_email}"
-    } 
\ No newline at end of file
+    } 
+
+def get_auth_test_public_key() -> str:
+    """Get the PEM public key trusted in auth test mode"""
+    return settings.auth_test_public_key.replace('\\n', '\n')
@@ -0,0 +1,188 @@
+import random
+import threading
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from itertools import combinations
+from typing import Dict, List, Optional, Set, Tuple
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Size of ingest.canvas_hash (ingest.HASH_BITS); not imported so that this
+# module stays free of numpy and PIL
+HASH_BITS = 736
+
+
+@dataclass
+class IndexEntry:
+    user_key: str
+    phash: int
+    embedding: object  # numpy vector from the analyzer
+    scores: Dict[str, float]
+
+
+@dataclass
+class DuplicateMatch:
+    entry: IndexEntry
+    distance: int
+
+
+class NearDuplicateIndex:
+    """
+    In-memory multi-index hash table over perceptual canvas hashes.
+
+    Each hash is split into `chunks` substrings, each with its own table.
+    By the pigeonhole principle, two hashes within Hamming distance r agree
+    to within r // chunks bits on at least one substring, so a lookup only
+    probes substrings within that radius and then checks full distances of
+    the candidates. Entries are scoped per user and evicted least recently
+    used once `max_entries` is reached.
+    """
+
+    def __init__(self, max_distance: int = 6, max_entries: int = 10000, chunks: int = 8):
+        if HASH_BITS % chunks:
+            raise ValueError("chunks must divide the hash size")
+
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.chunks = chunks
+        self.chunk_bits = HASH_BITS // chunks
+        self._chunk_mask = (1 << self.chunk_bits) - 1
+
+        self._entries: "OrderedDict[int, IndexEntry]" = OrderedDict()
+        # One table per chunk: (user_key, chunk value) -> entry ids
+        self._tables: List[Dict[Tuple[str, int], Set[int]]] = [{} for _ in range(chunks)]
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        self._lookups = 0
+        self._hits = 0
+        self._candidates = 0
+        self._false_candidates = 0
+        self._evictions = 0
+        self._hit_distances = [0] * (HASH_BITS + 1)
+        self._verified = [0] * (HASH_BITS + 1)
+        self._verified_agree = [0] * (HASH_BITS + 1)
+
+    def _split(self, phash: int) -> List[int]:
+        return [(phash >> (i * self.chunk_bits)) & self._chunk_mask for i in range(self.chunks)]
+
+    def _probes(self, value: int, radius: int):
+        """Chunk values within `radius` bit flips of `value`"""
+        yield value
+        for flips in range(1, radius + 1):
+            for bits in combinations(range(self.chunk_bits), flips):
+                probe = value
+                for bit in bits:
+                    probe ^= 1 << bit
+                yield probe
+
+    def lookup(self, user_key: str, phash: int, max_distance: Optional[int] = None) -> Optional[DuplicateMatch]:
+        """Closest stored entry for this user within max_distance, if any"""
+        max_distance = self.max_distance if max_distance is None else max_distance
+        radius = max_distance // self.chunks
+
+        with self._lock:
+            self._lookups += 1
+            seen: Set[int] = set()
+            best: Optional[Tuple[int, int]] = None
+
+            for i, value in enumerate(self._split(phash)):
+                table = self._tables[i]
+                for probe in self._probes(value, radius):
+                    for entry_id in table.get((user_key, probe), ()):
+                        if entry_id in seen:
+                            continue
+                        seen.add(entry_id)
+                        distance = (self._entries[entry_id].phash ^ phash).bit_count()
+                        if distance > max_distance:
+                            self._false_candidates += 1
+                        elif best is None or distance < best[1]:
+                            best = (entry_id, distance)
+
+            self._candidates += len(seen)
+            if best is None:
+                return None
+
+            entry_id, distance = best
+            self._entries.move_to_end(entry_id)
+            self._hits += 1
+            self._hit_distances[distance] += 1
+            return DuplicateMatch(self._entries[entry_id], distance)
+
+    def add(self, user_key: str, phash: int, embedding, scores: Dict[str, float]):
+        """Store a prediction, evicting the least recently used entries if full"""
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = IndexEntry(user_key, phash, embedding, scores)
+            for i, value in enumerate(self._split(phash)):
+                self._tables[i].setdefault((user_key, value), set()).add(entry_id)
+
+            while len(self._entries) > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        entry_id, entry = self._entries.popitem(last=False)
+        for i, value in enumerate(self._split(entry.phash)):
+            key = (entry.user_key, value)
+            ids = self._tables[i].get(key)
+            if ids is None:
+                continue
+            ids.discard(entry_id)
+            if not ids:
+                del self._tables[i][key]
+        self._evictions += 1
+
+    def should_verify(self) -> bool:
+        """Whether to re-run the model on this hit to measure reuse accuracy"""
+        return settings.dedup_verify_rate > 0 and random.random() < settings.dedup_verify_rate
+
+    def record_verification(self, distance: int, agreed: bool):
+        """Record whether a reused prediction matched a fresh model run"""
+        with self._lock:
+            self._verified[distance] += 1
+            if agreed:
+                self._verified_agree[distance] += 1
+
+    def stats(self) -> Dict:
+        """Hit rates and accuracy by distance, for tuning max_distance"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "max_distance": self.max_distance,
+                "lookups": self._lookups,
+                "hits": self._hits,
+                "hit_rate": round(self._hits / self._lookups, 4) if self._lookups else 0.0,
+                "evictions": self._evictions,
+                # Substring matches that turned out to be too far apart: the cost of the index
+                "candidates": self._candidates,
+                "false_candidates": self._false_candidates,
+                "hits_by_distance": {
+                    str(d): count for d, count in enumerate(self._hit_distances) if count
+                },
+                "top_mood_agreement_by_distance": {
+                    str(d): round(self._verified_agree[d] / count, 4)
+                    for d, count in enumerate(self._verified) if count
+                },
+                "verified_by_distance": {
+                    str(d): count for d, count in enumerate(self._verified) if count
+                }
+            }
+
+
+# Global instance
+near_duplicate_index = None
+
+def get_near_duplicate_index() -> NearDuplicateIndex:
+    """Get global near-duplicate index instance (singleton pattern)"""
+    global near_duplicate_index
+    if near_duplicate_index is None:
+        near_duplicate_index = NearDuplicateIndex(
+            max_distance=settings.dedup_max_distance,
+            max_entries=settings.dedup_max_entries
+        )
+    return near_duplicate_index
@@ -0,0 +1,41 @@
+import numpy as np
+from typing import Dict
+
+# Heuristic scores are scaled down so they never look more confident than CLIP
+HEURISTIC_SCALE = 0.3
+
+
+def heuristic_scores(image_array: np.ndarray) -> Dict[str, float]:
+    """
+    Rough mood scores from colour and texture statistics, without the model.
+    Used only as a last resort when the service is overloaded: bright,
+    saturated, warm drawings lean happy/excited, dark and desaturated ones
+    sad, light and smooth ones calm, red-heavy ones angry and busy,
+    high-contrast ones anxious.
+    """
+    pixels = image_array.reshape(-1, 3).astype(np.float32) / 255.0
+    red, green, blue = pixels[:, 0], pixels[:, 1], pixels[:, 2]
+    max_channel = pixels.max(axis=1)
+    min_channel = pixels.min(axis=1)
+
+    brightness = float(max_channel.mean())
+    saturation = float(((max_channel - min_channel) / np.maximum(max_channel, 1e-6)).mean())
+    warmth = float(np.clip((red - blue).mean() + 0.5, 0.0, 1.0))
+    redness = float(((red > 0.6) & (green < 0.4) & (blue < 0.4)).mean())
+
+    # Mean gradient magnitude as a measure of how busy the drawing is
+    gray = image_array.mean(axis=2)
+    busyness = float(np.clip(
+        (np.abs(np.diff(gray, axis=1)).mean() + np.abs(np.diff(gray, axis=0)).mean()) / 255.0 * 4.0,
+        0.0, 1.0
+    ))
+
+    scores = {
+        "Happy": 0.4 * saturation + 0.3 * brightness + 0.3 * warmth,
+        "Sad": 0.6 * (1.0 - brightness) + 0.4 * (1.0 - saturation),
+        "Calm": 0.4 * brightness + 0.4 * (1.0 - busyness) + 0.2 * (1.0 - saturation),
+        "Angry": 0.6 * min(1.0, redness * 4.0) + 0.4 * busyness,
+        "Anxious": 0.6 * busyness + 0.4 * (1.0 - brightness),
+        "Excited": 0.5 * saturation + 0.3 * busyness + 0.2 * warmth
+    }
+    return {mood: round(score * HEURISTIC_SCALE, 4) for mood, score in scores.items()}
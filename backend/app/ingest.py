@@ -0,0 +1,212 @@
+import io
+import logging
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CanvasIngest:
+    """Decoded canvas plus the ink statistics computed at ingest"""
+    image: np.ndarray
+    ink_coverage: float
+    ink_pixels: int
+    bbox: Optional[Tuple[int, int, int, int]]  # (left, top, right, bottom), exclusive end
+    background: Tuple[int, int, int]
+    phash: Optional[int] = None
+
+    @property
+    def blank(self) -> bool:
+        return (
+            self.ink_pixels < settings.canvas_min_ink_pixels
+            or self.ink_coverage < settings.canvas_min_ink_coverage
+        )
+
+
+def decode_canvas(contents: bytes) -> np.ndarray:
+    """
+    Decode uploaded bytes into an RGB uint8 array.
+    Transparent pixels are composited onto white: the drawing canvas exports
+    a transparent background, which a plain RGB conversion would turn black.
+    """
+    pil_image = Image.open(io.BytesIO(contents))
+
+    if pil_image.mode in ("RGBA", "LA") or (pil_image.mode == "P" and "transparency" in pil_image.info):
+        pil_image = pil_image.convert("RGBA")
+        background = Image.new("RGBA", pil_image.size, (255, 255, 255, 255))
+        pil_image = Image.alpha_composite(background, pil_image)
+
+    if pil_image.mode != "RGB":
+        pil_image = pil_image.convert("RGB")
+
+    return np.asarray(pil_image)
+
+
+def estimate_background(image: np.ndarray) -> np.ndarray:
+    """Background colour as the per-channel median of the border pixels"""
+    border = np.concatenate([image[0], image[-1], image[:, 0], image[:, -1]])
+    return np.median(border, axis=0).astype(np.int16)
+
+
+def ink_mask(image: np.ndarray, background: np.ndarray) -> np.ndarray:
+    """Pixels differing from the background by more than the ink threshold in any channel"""
+    difference = np.abs(image.astype(np.int16) - background)
+    return difference.max(axis=2) > settings.canvas_ink_threshold
+
+
+def ink_bbox(mask: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+    """Bounding box of the inked pixels, or None if there are none"""
+    rows = np.flatnonzero(mask.any(axis=1))
+    if rows.size == 0:
+        return None
+    cols = np.flatnonzero(mask.any(axis=0))
+    return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+
+def crop_to_ink(image: np.ndarray, bbox: Tuple[int, int, int, int], background: np.ndarray) -> np.ndarray:
+    """
+    Crop to the inked region plus a margin and pad it to a square with the
+    background colour, so CLIP's center crop does not cut off the drawing.
+    """
+    height, width = image.shape[:2]
+    left, top, right, bottom = bbox
+
+    margin = int(round(settings.canvas_crop_margin * max(right - left, bottom - top)))
+    left, top = max(0, left - margin), max(0, top - margin)
+    right, bottom = min(width, right + margin), min(height, bottom + margin)
+
+    cropped = image[top:bottom, left:right]
+    crop_height, crop_width = cropped.shape[:2]
+    side = max(crop_height, crop_width)
+    if crop_height == crop_width:
+        return np.ascontiguousarray(cropped)
+
+    square = np.empty((side, side, 3), dtype=image.dtype)
+    square[:] = background.astype(image.dtype)
+    y, x = (side - crop_height) // 2, (side - crop_width) // 2
+    square[y:y + crop_height, x:x + crop_width] = cropped
+    return square
+
+
+# Layout of the canvas hash, in bits
+STRUCTURE_SIZE = 16     # grayscale dHash grid, horizontal and vertical: 2 * 16 * 16
+CHROMA_SIZE = 8         # dHash grid of each of the two opponent colour channels: 2 * 8 * 8
+COLOUR_BINS = 8         # dark, grey and six hues, each a thermometer code of its share of the ink
+COLOUR_LEVELS = 8
+EXTENT_LEVELS = 8       # centre x/y and width/height of the drawing, as thermometer codes
+THUMBNAIL_SIZE = 4 * STRUCTURE_SIZE
+HASH_BITS = 2 * STRUCTURE_SIZE ** 2 + 2 * CHROMA_SIZE ** 2 + COLOUR_BINS * COLOUR_LEVELS + 4 * EXTENT_LEVELS
+
+# Share of ink pixels ignored on each side when framing the drawing, so a
+# stray dot does not reframe (and rehash) the whole drawing
+HASH_TRIM = 0.02
+# Thumbnail cells closer than this (out of 255) count as equal, so thin strokes
+# landing a pixel or two differently do not flip bits
+GRADIENT_DEADBAND = 8.0
+
+
+def trimmed_bbox(mask: np.ndarray, trim: float = HASH_TRIM) -> Tuple[int, int, int, int]:
+    """Bounding box of the ink with the outermost `trim` of it cut off on each side"""
+    rows = mask.sum(axis=1).cumsum()
+    cols = mask.sum(axis=0).cumsum()
+    total = rows[-1]
+    low, high = trim * total, (1.0 - trim) * total
+    top, bottom = int(np.searchsorted(rows, low, side="right")), int(np.searchsorted(rows, high)) + 1
+    left, right = int(np.searchsorted(cols, low, side="right")), int(np.searchsorted(cols, high)) + 1
+    return left, top, max(right, left + 1), max(bottom, top + 1)
+
+
+def _gradient_bits(channel: np.ndarray, size: int, axis: int) -> np.ndarray:
+    """dHash bits: one per adjacent pair of thumbnail cells along `axis` that gets brighter"""
+    shape = (size + 1, size) if axis == 1 else (size, size + 1)
+    thumbnail = np.asarray(Image.fromarray(channel).resize(shape, Image.BOX), dtype=np.float32)
+    return (np.diff(thumbnail, axis=axis) > GRADIENT_DEADBAND).ravel()
+
+
+def _thermometer(value: float, levels: int) -> np.ndarray:
+    """Encode a value in [0, 1] so the Hamming distance grows with the difference"""
+    return np.arange(levels) < int(round(min(max(value, 0.0), 1.0) * levels))
+
+
+def colour_shares(pixels: np.ndarray) -> np.ndarray:
+    """Share of the given RGB pixels that is dark, grey or in each of six hue sectors"""
+    rgb = pixels.astype(np.float32) / 255.0
+    high, low = rgb.max(axis=1), rgb.min(axis=1)
+    chroma = high - low
+    dark = high < 0.25
+    grey = ~dark & (chroma < 0.25 * np.maximum(high, 1e-6))
+
+    red, green, blue = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+    safe = np.maximum(chroma, 1e-6)
+    hue = np.where(
+        high == red, ((green - blue) / safe) % 6,
+        np.where(high == green, (blue - red) / safe + 2, (red - green) / safe + 4)
+    )
+    bins = np.where(dark, 0, np.where(grey, 1, 2 + np.floor(hue + 0.5).astype(np.int64) % 6))
+    return np.bincount(bins, minlength=COLOUR_BINS) / max(len(pixels), 1)
+
+
+def canvas_hash(image: np.ndarray, mask: np.ndarray) -> int:
+    """
+    Perceptual hash of the drawing rather than of the canvas, which is
+    mostly background. The ink region is framed (trimmed of stray strokes)
+    and stretched to fixed grids, so even a small drawing fills the
+    grayscale dHash. Colour is kept as an opponent-channel dHash, which
+    tells a red stroke from a blue one, plus the share of the ink in each
+    colour bin. Where the drawing sits on the canvas and how big it is are
+    kept as coarse thermometer codes.
+    """
+    height, width = mask.shape
+    left, top, right, bottom = trimmed_bbox(mask)
+    # One downscale of the crop in uint8; the hash grids are built from this thumbnail
+    crop = Image.fromarray(np.ascontiguousarray(image[top:bottom, left:right]))
+    thumbnail = np.asarray(crop.resize((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.BOX), dtype=np.float32)
+    red, green, blue = thumbnail[..., 0], thumbnail[..., 1], thumbnail[..., 2]
+    gray = thumbnail.mean(axis=2)
+
+    bits = np.concatenate([
+        _gradient_bits(gray, STRUCTURE_SIZE, axis=1),
+        _gradient_bits(gray, STRUCTURE_SIZE, axis=0),
+        _gradient_bits(red - blue, CHROMA_SIZE, axis=1),
+        _gradient_bits(green - (red + blue) / 2, CHROMA_SIZE, axis=1),
+        *(_thermometer(share, COLOUR_LEVELS) for share in colour_shares(image[mask])),
+        *(_thermometer(value, EXTENT_LEVELS) for value in (
+            (left + right) / 2 / width,
+            (top + bottom) / 2 / height,
+            (right - left) / width,
+            (bottom - top) / height
+        ))
+    ])
+    return int.from_bytes(np.packbits(bits).tobytes(), "big") >> (-HASH_BITS % 8)
+
+
+def ingest_canvas(contents: bytes) -> CanvasIngest:
+    """
+    Decode an uploaded canvas and measure its ink.
+    Canvases with enough ink are cropped to the inked region and hashed; blank
+    ones are returned uncropped so the caller can reject them without a model call.
+    """
+    image = decode_canvas(contents)
+    background = estimate_background(image)
+    mask = ink_mask(image, background)
+    ink_pixels = int(np.count_nonzero(mask))
+
+    result = CanvasIngest(
+        image=image,
+        ink_coverage=ink_pixels / mask.size,
+        ink_pixels=ink_pixels,
+        bbox=ink_bbox(mask) if ink_pixels else None,
+        background=tuple(int(c) for c in background)
+    )
+
+    if not result.blank:
+        result.phash = canvas_hash(image, mask)
+        result.image = crop_to_ink(image, result.bbox, background)
+
+    return result
@@ -1,24 +1,45 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends
+import time
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Query, Header
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-import numpy as np
-import cv2
-from PIL import Image
-import io
 import logging
-from typing import Optional
-import random
+from contextlib import asynccontextmanager
+from typing import Optional, TYPE_CHECKING
+
+# numpy, PIL (via ingest) and the CLIP analyzer (torch) are imported on first
+# use so the process can start and answer liveness checks while the model loads
+if TYPE_CHECKING:
+    import numpy as np
 
-from .models import MoodPrediction, PingResponse
-from .mood_analyzer import get_mood_analyzer
+from .config import settings
+from .models import MoodPrediction, PingResponse, DetailLevel, MoodType
+from .model_loader import get_model_loader, ModelNotReady
+from .scheduler import get_inference_scheduler, AdmissionRejected, RateLimited, QueueFull, ANONYMOUS_KEY, DEFAULT_CLASS
+from .dedup import get_near_duplicate_index
+from .overload import get_overload_controller, ServiceTier
+from .serialization import render
+from .scoring import predict_from_scores, analyze_scores, fallback_result
 from .auth import get_current_user, require_user, get_optional_user, User
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load the mood analyzer in the background so startup does not block on it"""
+    if settings.auth_test_mode:
+        logger.warning("AUTH_TEST_MODE is enabled - trusting locally signed tokens, never use in production")
+    if settings.preload_model:
+        get_model_loader().start_background()
+    yield
+
 # Initialize FastAPI app
 app = FastAPI(
+    lifespan=lifespan,
     title="Art Therapy Mood Analyzer API",
     description="An AI-powered API that analyzes artwork to predict emotional states",
     version="1.0.0"
@@ -33,7 +54,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mood analyzer will be initialized lazily when first used
+_process_started = time.monotonic()
+
+@app.get("/livez")
+async def liveness():
+    """Liveness probe: the process is up and serving requests"""
+    return {
+        "status": "alive",
+        "uptime_seconds": round(time.monotonic() - _process_started, 3),
+        "import_seconds": IMPORT_SECONDS
+    }
+
+@app.get("/readyz")
+async def readiness():
+    """Readiness probe: 200 only once the model is loaded and warmed up"""
+    model_status = get_model_loader().status()
+    return JSONResponse(
+        status_code=200 if model_status["ready"] else 503,
+        content={
+            "status": "ready" if model_status["ready"] else "not_ready",
+            "model": model_status,
+            "import_seconds": IMPORT_SECONDS
+        }
+    )
 
 @app.get("/ping", response_model=PingResponse)
 async def ping():
@@ -44,45 +87,172 @@ async def ping():
         version="1.0.0"
     )
 
-@app.post("/predict", response_model=MoodPrediction)
+def resolve_priority_class(user: Optional[User], requested: str) -> str:
+    """
+    Map a request to a scheduler priority class.
+    Anonymous callers always share the anonymous class; authenticated callers
+    may opt down into a lower class (e.g. batch uploads) but never up.
+    """
+    if user is None:
+        return ANONYMOUS_KEY
+    
+    classes = get_inference_scheduler().classes
+    if requested == ANONYMOUS_KEY or requested not in classes:
+        raise HTTPException(status_code=400, detail=f"Unknown priority class: {requested}")
+    
+    # A larger weight means a larger share of the model
+    if DEFAULT_CLASS in classes and classes[requested].weight > classes[DEFAULT_CLASS].weight:
+        raise HTTPException(status_code=400, detail=f"Priority class not allowed: {requested}")
+    
+    return requested
+
+def model_device() -> Optional[str]:
+    """Device of the loaded model, without waiting for it to load"""
+    loader = get_model_loader()
+    return loader.get().device if loader.ready else None
+
+def run_embedding(image_array: "np.ndarray", reduced_precision: bool = False):
+    """
+    Run the image encoder; called from a worker thread so the event loop stays free.
+    Returns (embedding, scores), or (None, None) if the model failed.
+    """
+    analyzer = get_model_loader().get()
+    try:
+        embedding = analyzer.embed_image(image_array, reduced_precision=reduced_precision)
+    except Exception as e:
+        logger.error(f"Error in CLIP mood analysis: {e}")
+        return None, None
+    return embedding, analyzer.scores_from_embedding(embedding)
+
+@app.post(
+    "/predict",
+    response_model=MoodPrediction,
+    responses={200: {"content": {"application/msgpack": {}}}}
+)
 async def predict_mood(
     image: UploadFile = File(...),
+    priority: str = Query(DEFAULT_CLASS, description="Priority class for authenticated callers, e.g. interactive or batch"),
+    detail: DetailLevel = Query(DetailLevel.FULL, description="Amount of analysis details to include in the response"),
+    accept: Optional[str] = Header(None),
     user: Optional[User] = Depends(get_optional_user)
 ):
-    """Analyze an artwork image and predict the mood"""
+    """
+    Analyze an artwork image and predict the mood.
+    Responds with MessagePack instead of JSON when the Accept header asks for application/msgpack.
+    """
+    # Validate file type
+    if not image.content_type.startswith('image/'):
+        raise HTTPException(status_code=400, detail="File must be an image")
+    
+    class_name = resolve_priority_class(user, priority)
+    user_id = user.uid if user else ANONYMOUS_KEY
+    
     try:
-        # Validate file type
-        if not image.content_type.startswith('image/'):
-            raise HTTPException(status_code=400, detail="File must be an image")
-        
         # Read and process the image
         contents = await image.read()
         
-        # Convert to PIL Image
-        pil_image = Image.open(io.BytesIO(contents))
+        # Decode, measure ink coverage and crop to the drawing
+        from .ingest import ingest_canvas
+        canvas = await run_in_threadpool(ingest_canvas, contents)
+        
+        if canvas.blank:
+            logger.info(f"User {user_id} - insufficient drawing (ink coverage {canvas.ink_coverage:.4f})")
+            raise HTTPException(
+                status_code=422,
+                detail=f"Insufficient drawing: only {canvas.ink_coverage:.2%} of the canvas has ink"
+            )
+        
+        # Degrade gracefully when the model queue or latency is over budget
+        controller = get_overload_controller()
+        tier = controller.tier()
+        detail_level = detail.value if tier < ServiceTier.NO_DETAILS else DetailLevel.NONE.value
         
-        # Convert to RGB if necessary
-        if pil_image.mode != 'RGB':
-            pil_image = pil_image.convert('RGB')
+        source = "model"
+        embedding = scores = None
         
-        # Convert to numpy array for analysis
-        image_array = np.array(pil_image)
+        # Reuse the scores of this user's earlier, nearly identical drawing;
+        # without the model, accept a looser match
+        index = get_near_duplicate_index() if settings.dedup_enabled and user else None
+        max_distance = settings.overload_fallback_distance if tier >= ServiceTier.CACHED_OR_HEURISTIC else None
+        match = index.lookup(user_id, canvas.phash, max_distance=max_distance) if index else None
+        verify = match is not None and tier < ServiceTier.CACHED_OR_HEURISTIC and index.should_verify()
         
-        # Get CLIP mood analyzer instance
-        analyzer = get_mood_analyzer()
+        if match is None and tier >= ServiceTier.CACHED_OR_HEURISTIC:
+            from .heuristics import heuristic_scores
+            scores = heuristic_scores(canvas.image)
+            source = "heuristic"
+        elif match is None or verify:
+            # Answer 503 until the model has loaded rather than tie up a worker thread
+            get_model_loader().require()
+            timeout = settings.overload_short_queue_timeout if tier >= ServiceTier.SHORT_QUEUE else None
+            started = time.monotonic()
+            observe = True
+            try:
+                # Wait for a fair share of the model, then embed the drawing using CLIP
+                async with get_inference_scheduler().slot(user_id, class_name, timeout=timeout):
+                    embedding, scores = await run_in_threadpool(
+                        run_embedding, canvas.image, tier >= ServiceTier.REDUCED_PRECISION
+                    )
+            except (RateLimited, QueueFull):
+                # Turned away before queueing, so the latency says nothing about load
+                observe = False
+                raise
+            finally:
+                if observe:
+                    controller.observe(time.monotonic() - started)
         
-        # Analyze the mood using CLIP
-        mood, confidence = analyzer.analyze_mood(image_array)
+        if match is not None and verify and scores is not None:
+            index.record_verification(
+                match.distance,
+                predict_from_scores(match.entry.scores)[0] == predict_from_scores(scores)[0]
+            )
+        elif match is not None:
+            scores = match.entry.scores
+            source = "near-duplicate"
         
-        user_id = user.uid if user else "anonymous"
-        logger.info(f"User {user_id} - CLIP Analysis - Mood: {mood} with confidence: {confidence:.2f}")
+        device = model_device()
+        if scores is None:
+            mood, confidence, details = fallback_result("image encoding failed", detail_level, device)
+        else:
+            if index and match is None and source == "model" and tier < ServiceTier.REDUCED_PRECISION:
+                index.add(user_id, canvas.phash, embedding, scores)
+            mood, confidence, details = analyze_scores(scores, detail_level, device)
         
-        return MoodPrediction(
-            mood=mood,
-            confidence=confidence,
-            analysis_details=analyzer.get_mood_analysis_details(image_array)
+        headers = {"X-Prediction-Source": source, "X-Served-Tier": tier.label}
+        if source == "near-duplicate":
+            headers["X-Near-Duplicate-Distance"] = str(match.distance)
+        
+        logger.info(f"User {user_id} - CLIP Analysis ({source}, {tier.label}) - Mood: {mood} with confidence: {confidence:.2f}")
+        
+        # Built from the analyzer's own output, so serialize it without
+        # another round of MoodPrediction validation
+        return render(
+            {
+                "mood": mood,
+                "confidence": confidence,
+                "analysis_details": details,
+                "served_tier": tier.label
+            },
+            accept=accept,
+            headers=headers
         )
         
+    except HTTPException:
+        raise
+    except ModelNotReady as e:
+        logger.warning(f"User {user_id} - {e}")
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, round(e.retry_after)))}
+        )
+    except AdmissionRejected as e:
+        logger.warning(f"User {user_id} - request rejected ({class_name}): {e.reason}")
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.reason,
+            headers={"Retry-After": str(max(1, round(e.retry_after)))}
+        )
     except Exception as e:
         logger.error(f"Error processing image: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error analyzing image: {str(e)}")
@@ -90,8 +260,8 @@ async def predict_mood(
 @app.get("/moods")
 async def get_available_moods():
     """Get list of available mood categories"""
-    analyzer = get_mood_analyzer()
-    available_moods = analyzer.get_available_moods()
+    # Same categories as the analyzer, without loading the model
+    available_moods = [mood.value for mood in MoodType]
     
     return {
         "moods": available_moods,
@@ -110,33 +280,37 @@ async def get_available_moods():
 async def health_check():
     """Detailed health check"""
     from datetime import datetime
-    import torch
     
-    try:
-        analyzer = get_mood_analyzer()
-        clip_ready = True
-    except Exception as e:
-        logger.error(f"CLIP model not ready: {e}")
-        clip_ready = False
+    # Report on the model without waiting for it to load
+    loader = get_model_loader()
+    clip_ready = loader.ready
+    analyzer = loader.get() if clip_ready else None
     
     return {
         "status": "healthy",
         "services": {
             "clip_model": clip_ready,
-            "pytorch": True,
-            "gpu_acceleration": torch.backends.mps.is_available() or torch.cuda.is_available(),
+            "pytorch": clip_ready,
+            "gpu_acceleration": clip_ready and analyzer.device != "cpu",
             "api": True
         },
         "model_info": {
             "type": "OpenAI CLIP ViT-B/32",
             "method": "Cosine Similarity Analysis",
-            "device": analyzer.device if clip_ready else "unknown",
-            "mps_available": torch.backends.mps.is_available(),
-            "cuda_available": torch.cuda.is_available()
+            "device": analyzer.device,
+            "mps_available": analyzer.mps_available,
+            "cuda_available": analyzer.cuda_available
         } if clip_ready else {},
+        "model_loading": loader.status(),
+        "scheduler": get_inference_scheduler().snapshot(),
+        "near_duplicates": get_near_duplicate_index().stats(),
+        "overload": get_overload_controller().status(),
         "timestamp": datetime.now().isoformat()
     }
 
+IMPORT_SECONDS = round(time.perf_counter() - _import_started, 4)
+logger.info(f"app.main imported in {IMPORT_SECONDS * 1000:.1f}ms")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
@@ -0,0 +1,167 @@
+import asyncio
+import time
+import logging
+import threading
+from enum import Enum
+from typing import Dict, Optional
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Retry-After while a load is in progress
+LOADING_RETRY_AFTER = 5.0
+
+
+class ModelState(str, Enum):
+    PENDING = "pending"
+    IMPORTING = "importing"
+    LOADING = "loading"
+    WARMING_UP = "warming_up"
+    READY = "ready"
+    FAILED = "failed"
+
+
+class ModelNotReady(Exception):
+    """Raised when the analyzer is needed before it has loaded"""
+
+    def __init__(self, state: ModelState, retry_after: float):
+        super().__init__(f"Model is not ready ({state.value})")
+        self.state = state
+        self.retry_after = retry_after
+
+
+class ModelLoader:
+    """
+    Loads the CLIP mood analyzer off the request path and tracks its progress.
+
+    Importing torch/clip and loading the weights takes seconds, so the API
+    starts serving liveness checks immediately and only reports ready once
+    the model has been loaded and run once. Requests never wait for the load:
+    until it finishes they get ModelNotReady. A failed load is retried by the
+    one background task, with exponential backoff.
+    """
+
+    def __init__(self):
+        self.state = ModelState.PENDING
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.attempts = 0
+        self.next_retry_at: Optional[float] = None
+        self._analyzer = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Future] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == ModelState.READY
+
+    def load(self):
+        """Load the model (blocking); safe to call from several threads"""
+        if self._analyzer is not None:
+            return self._analyzer
+
+        with self._lock:
+            if self._analyzer is not None:
+                return self._analyzer
+
+            self.started_at = time.monotonic()
+            self.error = None
+            try:
+                self.state = ModelState.IMPORTING
+                import numpy as np
+                from .mood_analyzer import get_mood_analyzer
+
+                self.state = ModelState.LOADING
+                analyzer = get_mood_analyzer()
+
+                # One forward pass so the first real request does not pay for lazy initialization
+                self.state = ModelState.WARMING_UP
+                analyzer.score_image(np.full((224, 224, 3), 255, dtype=np.uint8))
+                if settings.overload_enabled and settings.overload_max_tier >= 3:
+                    # Built now so the first overloaded request does not pay for it
+                    analyzer.prepare_reduced_encoder()
+            except Exception as e:
+                self.state = ModelState.FAILED
+                self.error = str(e)
+                self.finished_at = time.monotonic()
+                logger.error(f"Model loading failed: {e}")
+                raise
+
+            self._analyzer = analyzer
+            self.state = ModelState.READY
+            self.finished_at = time.monotonic()
+            logger.info(f"Model ready in {self.finished_at - self.started_at:.2f}s")
+
+        return self._analyzer
+
+    def start_background(self):
+        """Start loading in a worker thread; must be called from the event loop"""
+        if self._task is not None or self._analyzer is not None:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._load_with_retries())
+
+    async def _load_with_retries(self):
+        loop = asyncio.get_running_loop()
+        delay = settings.model_load_retry_initial
+        while True:
+            self.attempts += 1
+            self.next_retry_at = None
+            try:
+                await loop.run_in_executor(None, self.load)
+                return
+            except Exception:
+                # Already logged and recorded in state
+                pass
+            self.next_retry_at = time.monotonic() + delay
+            logger.info(f"Retrying model load in {delay:.0f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, settings.model_load_retry_max)
+
+    def retry_after(self) -> float:
+        """Seconds a caller should wait before asking for the model again"""
+        if self.state == ModelState.FAILED and self.next_retry_at is not None:
+            return max(1.0, self.next_retry_at - time.monotonic() + LOADING_RETRY_AFTER)
+        return LOADING_RETRY_AFTER
+
+    def get(self):
+        """Return the analyzer, or raise ModelNotReady if it has not loaded yet"""
+        if self._analyzer is None:
+            raise ModelNotReady(self.state, self.retry_after())
+        return self._analyzer
+
+    def require(self):
+        """
+        Like get(), but starts the background load if nothing has started it
+        (model preloading is off). Must be called from the event loop.
+        """
+        if self._analyzer is None:
+            self.start_background()
+        return self.get()
+
+    def status(self) -> Dict:
+        load_seconds = None
+        if self.started_at is not None:
+            end = self.finished_at if self.finished_at is not None else time.monotonic()
+            load_seconds = round(end - self.started_at, 3)
+
+        return {
+            "state": self.state.value,
+            "ready": self.ready,
+            "load_seconds": load_seconds,
+            "error": self.error,
+            "attempts": self.attempts,
+            "next_retry_in": (
+                round(max(0.0, self.next_retry_at - time.monotonic()), 1)
+                if self.state == ModelState.FAILED and self.next_retry_at is not None else None
+            )
+        }
+
+
+# Global instance
+model_loader = ModelLoader()
+
+def get_model_loader() -> ModelLoader:
+    """Get global model loader instance"""
+    return model_loader
@@ -10,6 +10,11 @@ class MoodType(str, Enum):
     ANXIOUS = "Anxious"
     EXCITED = "Excited"
 
+class DetailLevel(str, Enum):
+    NONE = "none"
+    SCORES = "scores"
+    FULL = "full"
+
 class PingResponse(BaseModel):
     message: str
     status: str
@@ -19,6 +24,7 @@ class MoodPrediction(BaseModel):
     mood: MoodType
     confidence: float = Field(..., ge=0.0, le=1.0, description="Confidence score between 0 and 1")
     analysis_details: Optional[Dict[str, Any]] = None
+    served_tier: Optional[str] = Field(None, description="Quality tier the prediction was served at")
 
 class User(BaseModel):
     uid: str
@@ -3,10 +3,14 @@ import cv2
 from PIL import Image
 import torch
 import clip
-from typing import Tuple, Dict, List
+from typing import Tuple, Dict, List, Optional
+import copy
 import logging
+import threading
 from io import BytesIO
 
+from . import scoring
+
 logger = logging.getLogger(__name__)
 
 class CLIPMoodAnalyzer:
@@ -16,11 +20,14 @@ class CLIPMoodAnalyzer:
     """
     
     def __init__(self):
+        self.mps_available = torch.backends.mps.is_available()
+        self.cuda_available = torch.cuda.is_available()
+        
         # Prioritize MPS (Metal Performance Shaders) for Apple Silicon, then CUDA, then CPU
-        if torch.backends.mps.is_available():
+        if self.mps_available:
             self.device = "mps"
             logger.info("Using Apple Silicon GPU (MPS) for CLIP inference")
-        elif torch.cuda.is_available():
+        elif self.cuda_available:
             self.device = "cuda"
             logger.info("Using NVIDIA GPU (CUDA) for CLIP inference")
         else:
@@ -85,6 +92,10 @@ class CLIPMoodAnalyzer:
         
         # Precompute text embeddings for efficiency
         self._precompute_text_embeddings()
+        
+        # Cheaper image encoder for overload, built by prepare_reduced_encoder()
+        self._reduced_visual = None
+        self._reduced_lock = threading.Lock()
     
     def _precompute_text_embeddings(self):
         """Precompute embeddings for all mood descriptions"""
@@ -105,6 +116,12 @@ class CLIPMoodAnalyzer:
                 
                 self.mood_embeddings[mood] = avg_embedding
         
+        # Same embeddings as a (moods x dim) matrix for scoring stored numpy embeddings
+        self._mood_names = list(self.mood_embeddings.keys())
+        self._mood_matrix = torch.stack(
+            [self.mood_embeddings[mood] for mood in self._mood_names]
+        ).float().cpu().numpy()
+        
         logger.info(f"Precomputed embeddings for {len(self.mood_embeddings)} moods")
     
     def _prepare_image(self, image_array: np.ndarray) -> torch.Tensor:
@@ -149,80 +166,127 @@ class CLIPMoodAnalyzer:
         
         return similarities
     
-    def analyze_mood(self, image_array: np.ndarray) -> Tuple[str, float]:
+    def prepare_reduced_encoder(self):
         """
-        Analyze mood using CLIP embeddings and cosine similarity
+        Build the reduced-precision image encoder used under overload.
+        On CPU this is an int8 dynamically quantized copy of the visual
+        transformer; on GPU CLIP already runs in half precision, so the
+        regular encoder is reused.
+        """
+        if self._reduced_visual is not None:
+            return self._reduced_visual
+        
+        with self._reduced_lock:
+            if self._reduced_visual is None:
+                if self.device == "cpu":
+                    self._reduced_visual = torch.quantization.quantize_dynamic(
+                        copy.deepcopy(self.model.visual), {torch.nn.Linear}, dtype=torch.qint8
+                    )
+                    logger.info("Prepared int8 quantized image encoder")
+                else:
+                    self._reduced_visual = self.model.visual
+        
+        return self._reduced_visual
+    
+    def _encode_image(self, image_array: np.ndarray, reduced_precision: bool = False) -> torch.Tensor:
+        """
+        Run the CLIP image encoder and return a normalized embedding
+        """
+        image_tensor = self._prepare_image(image_array)
+        
+        with torch.no_grad():
+            if reduced_precision:
+                visual = self.prepare_reduced_encoder()
+                image_embedding = visual(image_tensor.type(self.model.dtype))
+            else:
+                image_embedding = self.model.encode_image(image_tensor)
+            image_embedding = image_embedding / image_embedding.norm(dim=-1, keepdim=True)
+        
+        return image_embedding
+    
+    def score_image(self, image_array: np.ndarray) -> Dict[str, float]:
+        """
+        Similarity scores for all moods from a single forward pass
+        """
+        return self._calculate_cosine_similarities(self._encode_image(image_array))
+    
+    def embed_image(self, image_array: np.ndarray, reduced_precision: bool = False) -> np.ndarray:
+        """
+        Normalized image embedding as a float32 numpy vector, suitable for storing
+        """
+        return self._encode_image(image_array, reduced_precision).squeeze(0).float().cpu().numpy()
+    
+    def scores_from_embedding(self, embedding: np.ndarray) -> Dict[str, float]:
+        """
+        Similarity scores for all moods from a stored (normalized) embedding
+        """
+        similarities = self._mood_matrix @ embedding
+        return {
+            mood: max(0.0, float(similarity))  # Ensure non-negative
+            for mood, similarity in zip(self._mood_names, similarities)
+        }
+    
+    def predict_from_scores(self, similarities: Dict[str, float]) -> Tuple[str, float]:
+        """
+        Pick the top mood and turn its similarity into a confidence in [0, 1]
+        """
+        return scoring.predict_from_scores(similarities)
+    
+    def build_analysis_details(self, similarities: Dict[str, float], detail: str = "full") -> Optional[Dict]:
+        """
+        Build the analysis details for a response at the requested detail level
+        """
+        return scoring.build_analysis_details(similarities, detail, self.device)
+    
+    def analyze_scores(self, similarities: Dict[str, float], detail: str = "full") -> Tuple[str, float, Optional[Dict]]:
+        """
+        Predict the mood and build analysis details from precomputed scores
+        """
+        return scoring.analyze_scores(similarities, detail, self.device)
+    
+    def fallback_result(self, error: str, detail: str = "full") -> Tuple[str, float, Optional[Dict]]:
+        """
+        Default result returned when the analysis fails
+        """
+        return scoring.fallback_result(error, detail, self.device)
+    
+    def analyze(self, image_array: np.ndarray, detail: str = "full") -> Tuple[str, float, Optional[Dict]]:
+        """
+        Predict the mood and build analysis details from one forward pass
         
         Args:
             image_array: Input image as numpy array
+            detail: Detail level of the analysis details ("none", "scores" or "full")
             
         Returns:
-            Tuple of (predicted_mood, confidence_score)
+            Tuple of (predicted_mood, confidence_score, analysis_details)
         """
         try:
-            # Prepare image for CLIP
-            image_tensor = self._prepare_image(image_array)
-            
-            # Get image embedding
-            with torch.no_grad():
-                image_embedding = self.model.encode_image(image_tensor)
-                image_embedding = image_embedding / image_embedding.norm(dim=-1, keepdim=True)
-            
-            # Calculate similarities with all moods
-            similarities = self._calculate_cosine_similarities(image_embedding)
-            
-            # Find the mood with highest similarity
-            predicted_mood = max(similarities.keys(), key=lambda k: similarities[k])
-            confidence = similarities[predicted_mood]
-            
-            # Convert similarity to confidence percentage
-            # CLIP similarities are typically in range [0, 1], so we can use them directly
-            confidence_percentage = min(confidence * 100, 100.0)
-            
-            logger.info(f"CLIP Analysis - Mood: {predicted_mood}, Confidence: {confidence_percentage:.2f}%")
-            logger.debug(f"All similarities: {similarities}")
-            
-            return predicted_mood, confidence_percentage / 100.0
-            
+            return self.analyze_scores(self.score_image(image_array), detail)
         except Exception as e:
             logger.error(f"Error in CLIP mood analysis: {e}")
             # Fallback to a default mood
-            return "Calm", 0.5
+            return self.fallback_result(str(e), detail)
+    
+    def analyze_mood(self, image_array: np.ndarray) -> Tuple[str, float]:
+        """
+        Analyze mood using CLIP embeddings and cosine similarity
+        
+        Args:
+            image_array: Input image as numpy array
+            
+        Returns:
+            Tuple of (predicted_mood, confidence_score)
+        """
+        mood, confidence, _ = self.analyze(image_array, detail="none")
+        return mood, confidence
     
     def get_mood_analysis_details(self, image_array: np.ndarray) -> Dict:
         """
         Get detailed analysis including similarities for all moods
         """
-        try:
-            image_tensor = self._prepare_image(image_array)
-            
-            with torch.no_grad():
-                image_embedding = self.model.encode_image(image_tensor)
-                image_embedding = image_embedding / image_embedding.norm(dim=-1, keepdim=True)
-            
-            similarities = self._calculate_cosine_similarities(image_embedding)
-            
-            # Sort by similarity score
-            sorted_moods = sorted(similarities.items(), key=lambda x: x[1], reverse=True)
-            
-            return {
-                "method": "CLIP_cosine_similarity",
-                "model": "ViT-B/32",
-                "device": self.device,
-                "all_scores": similarities,
-                "ranked_moods": sorted_moods,
-                "top_prediction": sorted_moods[0][0] if sorted_moods else "Calm"
-            }
-            
-        except Exception as e:
-            logger.error(f"Error getting analysis details: {e}")
-            return {
-                "method": "CLIP_cosine_similarity",
-                "model": "ViT-B/32",
-                "device": self.device,
-                "error": str(e),
-                "fallback": True
-            }
+        _, _, details = self.analyze(image_array, detail="full")
+        return details
     
     def get_available_moods(self) -> List[str]:
         """Return list of available mood categories"""
@@ -231,12 +295,16 @@ class CLIPMoodAnalyzer:
 
 # Global instance
 mood_analyzer = None
+_mood_analyzer_lock = threading.Lock()
 
 def get_mood_analyzer() -> CLIPMoodAnalyzer:
     """Get global mood analyzer instance (singleton pattern)"""
     global mood_analyzer
     if mood_analyzer is None:
-        mood_analyzer = CLIPMoodAnalyzer()
+        # The model may be loaded from a background thread and a request at the same time
+        with _mood_analyzer_lock:
+            if mood_analyzer is None:
+                mood_analyzer = CLIPMoodAnalyzer()
     return mood_analyzer
 
 # Legacy compatibility functions
@@ -0,0 +1,151 @@
+import time
+import threading
+import logging
+from collections import deque
+from enum import IntEnum
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+from .config import settings
+from .scheduler import get_inference_scheduler
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceTier(IntEnum):
+    """
+    Quality tiers, cheapest last. Each tier keeps the savings of the ones before it.
+    """
+    FULL = 0
+    NO_DETAILS = 1          # analysis details dropped
+    SHORT_QUEUE = 2         # queued requests give up sooner
+    REDUCED_PRECISION = 3   # cheaper, quantized image encoder
+    CACHED_OR_HEURISTIC = 4 # no model call: near-duplicate or heuristic answer
+
+    @property
+    def label(self) -> str:
+        return self.name.lower()
+
+
+class OverloadController:
+    """
+    Chooses the service tier from queue depth and recent p99 latency.
+
+    The controller steps up one tier at a time while the inference queue is
+    deeper than `queue_high` or p99 latency is above the SLO, at most once per
+    `escalate_interval`. It steps back down one tier only after the queue has
+    stayed below `queue_low` and p99 below `recover_ratio` of the SLO for a full
+    `recover_interval`, so it does not flap around the threshold.
+    """
+
+    def __init__(
+        self,
+        queue_depth: Callable[[], int],
+        slo_p99_ms: float = 2000.0,
+        queue_high: int = 8,
+        queue_low: int = 2,
+        recover_ratio: float = 0.5,
+        escalate_interval: float = 2.0,
+        recover_interval: float = 15.0,
+        latency_window: float = 30.0,
+        max_tier: ServiceTier = ServiceTier.CACHED_OR_HEURISTIC
+    ):
+        self.queue_depth = queue_depth
+        self.slo_p99 = slo_p99_ms / 1000.0
+        self.queue_high = queue_high
+        self.queue_low = queue_low
+        self.recover_ratio = recover_ratio
+        self.escalate_interval = escalate_interval
+        self.recover_interval = recover_interval
+        self.latency_window = latency_window
+        self.max_tier = max_tier
+
+        self._tier = ServiceTier.FULL
+        self._latencies: Deque[Tuple[float, float]] = deque(maxlen=1000)
+        self._last_change = 0.0
+        self._calm_since: Optional[float] = None
+        self._lock = threading.Lock()
+        self._served: Dict[str, int] = {tier.label: 0 for tier in ServiceTier}
+        self._transitions = 0
+
+    def observe(self, latency: float, now: Optional[float] = None):
+        """Record the latency (seconds) of a request that went through the model queue"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._latencies.append((now, latency))
+
+    def p99(self, now: Optional[float] = None) -> Optional[float]:
+        """p99 latency over the recent window, in seconds"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            while self._latencies and now - self._latencies[0][0] > self.latency_window:
+                self._latencies.popleft()
+            latencies = sorted(latency for _, latency in self._latencies)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))]
+
+    def tier(self, now: Optional[float] = None) -> ServiceTier:
+        """Update and return the tier to serve the next request at"""
+        now = time.monotonic() if now is None else now
+        depth = self.queue_depth()
+        p99 = self.p99(now)
+
+        with self._lock:
+            overloaded = depth > self.queue_high or (p99 is not None and p99 > self.slo_p99)
+            calm = depth <= self.queue_low and (p99 is None or p99 < self.recover_ratio * self.slo_p99)
+
+            if overloaded:
+                self._calm_since = None
+                if self._tier < self.max_tier and now - self._last_change >= self.escalate_interval:
+                    self._set_tier(ServiceTier(self._tier + 1), now, depth, p99)
+            elif calm and self._tier > ServiceTier.FULL:
+                if self._calm_since is None:
+                    self._calm_since = now
+                elif now - self._calm_since >= self.recover_interval:
+                    self._set_tier(ServiceTier(self._tier - 1), now, depth, p99)
+                    self._calm_since = now
+            else:
+                self._calm_since = None
+
+            self._served[self._tier.label] += 1
+            return self._tier
+
+    def _set_tier(self, tier: ServiceTier, now: float, depth: int, p99: Optional[float]):
+        p99_text = f"{p99 * 1000:.0f}ms" if p99 is not None else "n/a"
+        logger.warning(f"Service tier {self._tier.label} -> {tier.label} (queue depth {depth}, p99 {p99_text})")
+        self._tier = tier
+        self._last_change = now
+        self._transitions += 1
+
+    def status(self) -> Dict:
+        p99 = self.p99()
+        return {
+            "tier": self._tier.label,
+            "tier_level": int(self._tier),
+            "queue_depth": self.queue_depth(),
+            "p99_ms": round(p99 * 1000, 1) if p99 is not None else None,
+            "slo_p99_ms": self.slo_p99 * 1000,
+            "transitions": self._transitions,
+            "served_by_tier": dict(self._served)
+        }
+
+
+# Global instance
+overload_controller = None
+
+def get_overload_controller() -> OverloadController:
+    """Get global overload controller instance (singleton pattern)"""
+    global overload_controller
+    if overload_controller is None:
+        overload_controller = OverloadController(
+            get_inference_scheduler().queue_depth,
+            slo_p99_ms=settings.overload_slo_p99_ms,
+            queue_high=settings.overload_queue_high,
+            queue_low=settings.overload_queue_low,
+            recover_ratio=settings.overload_recover_ratio,
+            escalate_interval=settings.overload_escalate_interval,
+            recover_interval=settings.overload_recover_interval,
+            latency_window=settings.overload_latency_window,
+            max_tier=ServiceTier(settings.overload_max_tier) if settings.overload_enabled else ServiceTier.FULL
+        )
+    return overload_controller
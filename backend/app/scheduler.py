@@ -0,0 +1,308 @@
+import asyncio
+import time
+import logging
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+ANONYMOUS_KEY = "anonymous"
+# Class of authenticated requests that do not ask for one
+DEFAULT_CLASS = "interactive"
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted to the inference queue"""
+    status_code = 429
+
+    def __init__(self, reason: str, retry_after: float = 1.0):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class RateLimited(AdmissionRejected):
+    pass
+
+
+class QueueFull(AdmissionRejected):
+    pass
+
+
+class QueueTimeout(AdmissionRejected):
+    status_code = 503
+
+
+@dataclass
+class PriorityClass:
+    name: str
+    weight: int = 1
+    max_concurrency: int = 1
+    rate: float = 1.0
+    burst: int = 1
+
+
+class TokenBucket:
+    """
+    Classic token bucket: refills at `rate` tokens per second up to `capacity`.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def try_acquire(self, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+    def full(self, now: float) -> bool:
+        """True once the bucket has refilled; it is then the same as a new one"""
+        return self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+    def retry_after(self) -> float:
+        """Seconds until the next token becomes available"""
+        if self.rate <= 0:
+            return 60.0
+        return max(0.0, (1.0 - self.tokens) / self.rate)
+
+
+class FairScheduler:
+    """
+    Admission layer in front of the model.
+
+    Every request waits in a per-user queue (anonymous callers share a single
+    queue). Priority classes are served with stride scheduling, so each class
+    gets slots in proportion to its weight; within a class, users are served
+    round-robin so one heavy user cannot starve the others. Each class has a
+    concurrency cap, and each queue is rate limited with a token bucket whose
+    parameters come from its class. Buckets of idle users are dropped once they
+    have refilled, and the least recently used ones beyond `max_buckets`.
+    """
+
+    def __init__(
+        self,
+        classes: List[PriorityClass],
+        max_concurrency: int = 1,
+        max_queue_per_user: int = 16,
+        queue_timeout: float = 30.0,
+        max_buckets: int = 10000
+    ):
+        if not classes:
+            raise ValueError("At least one priority class is required")
+
+        self.classes: Dict[str, PriorityClass] = {c.name: c for c in classes}
+        self.max_concurrency = max_concurrency
+        self.max_queue_per_user = max_queue_per_user
+        self.queue_timeout = queue_timeout
+        self.max_buckets = max_buckets
+
+        # class -> user -> waiters; OrderedDict order is the round-robin order
+        self._queues: Dict[str, "OrderedDict[str, Deque[asyncio.Future]]"] = {
+            name: OrderedDict() for name in self.classes
+        }
+        # (class, user) -> bucket; OrderedDict order is least recently used first
+        self._buckets: "OrderedDict[tuple, TokenBucket]" = OrderedDict()
+        self._pass: Dict[str, float] = {name: 0.0 for name in self.classes}
+        self._running: Dict[str, int] = {name: 0 for name in self.classes}
+        self._active = 0
+        self._virtual_time = 0.0
+
+        self._admitted: Dict[str, int] = {name: 0 for name in self.classes}
+        self._rejected: Dict[str, int] = {name: 0 for name in self.classes}
+
+    def _bucket(self, class_name: str, user_key: str, now: Optional[float] = None) -> TokenBucket:
+        now = time.monotonic() if now is None else now
+        self._evict_buckets(now)
+
+        key = (class_name, user_key)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            priority_class = self.classes[class_name]
+            bucket = TokenBucket(priority_class.rate, priority_class.burst)
+            self._buckets[key] = bucket
+            while len(self._buckets) > max(1, self.max_buckets):
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def _evict_buckets(self, now: float):
+        """Drop buckets of idle users that have refilled, least recently used first"""
+        while self._buckets:
+            key, bucket = next(iter(self._buckets.items()))
+            if not bucket.full(now):
+                return
+            del self._buckets[key]
+
+    def _pending(self, class_name: str) -> int:
+        return sum(len(waiters) for waiters in self._queues[class_name].values())
+
+    def _pick_class(self) -> Optional[str]:
+        """Pick the eligible class with the smallest pass value"""
+        best = None
+        for name, priority_class in self.classes.items():
+            if not self._queues[name]:
+                continue
+            if self._running[name] >= priority_class.max_concurrency:
+                continue
+            if best is None or self._pass[name] < self._pass[best]:
+                best = name
+        return best
+
+    def _dispatch(self):
+        """Hand out free slots to waiting requests"""
+        while self._active < self.max_concurrency:
+            class_name = self._pick_class()
+            if class_name is None:
+                return
+
+            user_queues = self._queues[class_name]
+            user_key, waiters = next(iter(user_queues.items()))
+            waiter = waiters.popleft()
+            if waiters:
+                user_queues.move_to_end(user_key)
+            else:
+                del user_queues[user_key]
+
+            if waiter.done():
+                # Cancelled or timed out while queued
+                continue
+
+            self._active += 1
+            self._running[class_name] += 1
+            self._virtual_time = self._pass[class_name]
+            self._pass[class_name] += 1.0 / self.classes[class_name].weight
+            waiter.set_result(None)
+
+    def _remove_waiter(self, class_name: str, user_key: str, waiter: asyncio.Future):
+        waiters = self._queues[class_name].get(user_key)
+        if waiters is None:
+            return
+        try:
+            waiters.remove(waiter)
+        except ValueError:
+            return
+        if not waiters:
+            del self._queues[class_name][user_key]
+
+    async def acquire(self, user_key: str, class_name: str, timeout: Optional[float] = None):
+        """Wait for an inference slot; raises AdmissionRejected if refused"""
+        if class_name not in self.classes:
+            raise ValueError(f"Unknown priority class: {class_name}")
+
+        now = time.monotonic()
+        bucket = self._bucket(class_name, user_key, now)
+        if not bucket.try_acquire(now):
+            self._rejected[class_name] += 1
+            raise RateLimited("Rate limit exceeded", retry_after=bucket.retry_after())
+
+        user_queues = self._queues[class_name]
+        waiters = user_queues.get(user_key)
+        if waiters is not None and len(waiters) >= self.max_queue_per_user:
+            self._rejected[class_name] += 1
+            raise QueueFull("Too many pending requests", retry_after=1.0)
+
+        if not user_queues:
+            # A class that was idle does not get to bank credit while idle
+            self._pass[class_name] = max(self._pass[class_name], self._virtual_time)
+
+        waiter = asyncio.get_running_loop().create_future()
+        if waiters is None:
+            waiters = user_queues[user_key] = deque()
+        waiters.append(waiter)
+        self._dispatch()
+
+        try:
+            await asyncio.wait_for(waiter, timeout=self.queue_timeout if timeout is None else timeout)
+        except asyncio.TimeoutError:
+            self._remove_waiter(class_name, user_key, waiter)
+            self._rejected[class_name] += 1
+            raise QueueTimeout("Timed out waiting for inference slot", retry_after=1.0)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was granted just before the client went away
+                self.release(class_name)
+            else:
+                self._remove_waiter(class_name, user_key, waiter)
+            raise
+
+        self._admitted[class_name] += 1
+
+    def release(self, class_name: str):
+        self._active -= 1
+        self._running[class_name] -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, user_key: str, class_name: str, timeout: Optional[float] = None):
+        """Hold an inference slot for the duration of the block"""
+        await self.acquire(user_key, class_name, timeout=timeout)
+        try:
+            yield
+        finally:
+            self.release(class_name)
+
+    def queue_depth(self) -> int:
+        return sum(self._pending(name) for name in self.classes)
+
+    def snapshot(self) -> Dict:
+        """Current queue state, for health checks and monitoring"""
+        return {
+            "active": self._active,
+            "max_concurrency": self.max_concurrency,
+            "rate_limited_users": len(self._buckets),
+            "classes": {
+                name: {
+                    "weight": priority_class.weight,
+                    "running": self._running[name],
+                    "max_concurrency": priority_class.max_concurrency,
+                    "queued": self._pending(name),
+                    "queued_users": len(self._queues[name]),
+                    "admitted": self._admitted[name],
+                    "rejected": self._rejected[name]
+                }
+                for name, priority_class in self.classes.items()
+            }
+        }
+
+
+def build_priority_classes() -> List[PriorityClass]:
+    """Build priority classes from settings"""
+    return [
+        PriorityClass(
+            name=name,
+            weight=weight,
+            max_concurrency=settings.scheduler_class_concurrency.get(name, 1),
+            rate=settings.scheduler_class_rate.get(name, 1.0),
+            burst=settings.scheduler_class_burst.get(name, 1)
+        )
+        for name, weight in settings.scheduler_class_weights.items()
+    ]
+
+
+# Global instance
+inference_scheduler = None
+
+def get_inference_scheduler() -> FairScheduler:
+    """Get global inference scheduler instance (singleton pattern)"""
+    global inference_scheduler
+    if inference_scheduler is None:
+        inference_scheduler = FairScheduler(
+            build_priority_classes(),
+            max_concurrency=settings.inference_max_concurrency,
+            max_queue_per_user=settings.inference_max_queue_per_user,
+            queue_timeout=settings.inference_queue_timeout,
+            max_buckets=settings.scheduler_max_buckets
+        )
+    return inference_scheduler
@@ -0,0 +1,80 @@
+import logging
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Turning mood scores into a response needs neither torch nor the loaded
+# model, so near-duplicate and heuristic results can be served without them
+
+
+def predict_from_scores(similarities: Dict[str, float]) -> Tuple[str, float]:
+    """
+    Pick the top mood and turn its similarity into a confidence in [0, 1]
+    """
+    predicted_mood = max(similarities.keys(), key=lambda k: similarities[k])
+
+    # CLIP similarities are typically in range [0, 1], so we can use them directly
+    confidence = min(similarities[predicted_mood], 1.0)
+
+    return predicted_mood, confidence
+
+
+def build_analysis_details(
+    similarities: Dict[str, float],
+    detail: str = "full",
+    device: Optional[str] = None
+) -> Optional[Dict]:
+    """
+    Build the analysis details for a response at the requested detail level:
+    "none" returns nothing, "scores" only the per-mood scores and "full"
+    adds the ranking and model information.
+    """
+    if detail == "none":
+        return None
+
+    if detail == "scores":
+        return {"all_scores": similarities}
+
+    # Sort by similarity score
+    sorted_moods = sorted(similarities.items(), key=lambda x: x[1], reverse=True)
+
+    return {
+        "method": "CLIP_cosine_similarity",
+        "model": "ViT-B/32",
+        "device": device,
+        "all_scores": similarities,
+        "ranked_moods": sorted_moods,
+        "top_prediction": sorted_moods[0][0] if sorted_moods else "Calm"
+    }
+
+
+def analyze_scores(
+    similarities: Dict[str, float],
+    detail: str = "full",
+    device: Optional[str] = None
+) -> Tuple[str, float, Optional[Dict]]:
+    """
+    Predict the mood and build analysis details from precomputed scores
+    """
+    predicted_mood, confidence = predict_from_scores(similarities)
+
+    logger.info(f"CLIP Analysis - Mood: {predicted_mood}, Confidence: {confidence * 100:.2f}%")
+    logger.debug(f"All similarities: {similarities}")
+
+    return predicted_mood, confidence, build_analysis_details(similarities, detail, device)
+
+
+def fallback_result(error: str, detail: str = "full", device: Optional[str] = None) -> Tuple[str, float, Optional[Dict]]:
+    """
+    Default result returned when the analysis fails
+    """
+    details = None
+    if detail != "none":
+        details = {
+            "method": "CLIP_cosine_similarity",
+            "model": "ViT-B/32",
+            "device": device,
+            "error": error,
+            "fallback": True
+        }
+    return "Calm", 0.5, details
@@ -0,0 +1,66 @@
+import json
+import logging
+from typing import Any, Dict, Optional
+
+from fastapi import Response
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    logger.warning("orjson not available - falling back to the standard JSON encoder")
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    logger.warning("msgpack not available - MessagePack responses disabled")
+    MSGPACK_AVAILABLE = False
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def dumps_json(content: Any) -> bytes:
+    """Serialize to JSON bytes, using orjson when it is installed"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(content)
+    return json.dumps(content, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def negotiate_media_type(accept: Optional[str]) -> str:
+    """Pick MessagePack only when the client explicitly asks for it"""
+    if accept and MSGPACK_AVAILABLE:
+        for part in accept.split(","):
+            media_type = part.split(";")[0].strip().lower()
+            if media_type in MSGPACK_MEDIA_TYPES:
+                return media_type
+    return JSON_MEDIA_TYPE
+
+
+def render(
+    content: Any,
+    accept: Optional[str] = None,
+    status_code: int = 200,
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """
+    Serialize an already-valid payload straight to a Response.
+    Returning a Response from an endpoint skips FastAPI's response_model
+    validation, so this is only meant for payloads the server built itself.
+    """
+    media_type = negotiate_media_type(accept)
+    if media_type == JSON_MEDIA_TYPE:
+        body = dumps_json(content)
+    else:
+        body = msgpack.packb(content, use_bin_type=True)
+
+    return Response(
+        content=body,
+        status_code=status_code,
+        media_type=media_type,
+        headers={"Vary": "Accept", **(headers or {})}
+    )
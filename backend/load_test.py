@@ -0,0 +1,595 @@
+#!/usr/bin/env python3
+"""
+Open-loop HTTP load test for the Art Therapy backend.
+
+Requests are sent on a fixed schedule regardless of how fast the server
+answers, and latency is measured from the scheduled send time, so a slow
+server shows up as growing latency instead of a quietly lower request rate.
+
+Authenticated traffic uses ID tokens signed by a local RSA key. Start the
+backend with AUTH_TEST_MODE=true and AUTH_TEST_PUBLIC_KEY set to the
+matching public key (printed by `keygen`) and it will trust them; no
+Firebase project or network access is needed.
+
+Examples:
+    python load_test.py keygen
+    python load_test.py token --uid load-user-1
+    python load_test.py run --url http://127.0.0.1:8000 --rates 0.5,1,2,4
+    python load_test.py run --spawn --workers 1,2 --server-concurrency 1,2 --rates 0.5,1,2,4
+"""
+
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_KEY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".load_test_keys")
+TOKEN_ISSUER = "art-therapy-load-test"
+TOKEN_AUDIENCE = "art-therapy-api"
+
+# Same palette and brush range as DrawingCanvas.jsx
+PALETTE = [
+    "#000000", "#FF0000", "#00FF00", "#0000FF", "#FFFF00",
+    "#FF00FF", "#00FFFF", "#FFA500", "#800080", "#FFC0CB"
+]
+CANVAS_SIZES = [(300, 200), (600, 400), (1200, 800)]
+MODEL_ONLY_ENV = {
+    "OVERLOAD_ENABLED": "false",
+    "DEDUP_ENABLED": "false"
+}
+UNLIMITED_RATE_ENV = {
+    "SCHEDULER_CLASS_RATE": json.dumps({"interactive": 1e6, "batch": 1e6, "anonymous": 1e6}),
+    "SCHEDULER_CLASS_BURST": json.dumps({"interactive": 1000000, "batch": 1000000, "anonymous": 1000000})
+}
+COMPLEXITY_STROKES = {
+    "blank": (0, 0),
+    "simple": (1, 5),
+    "medium": (10, 30),
+    "complex": (60, 150)
+}
+
+
+# ---------------------------------------------------------------------------
+# Tokens
+# ---------------------------------------------------------------------------
+
+def generate_keypair(key_dir: str) -> Tuple[str, str]:
+    """Create an RSA key pair for signing test tokens"""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    os.makedirs(key_dir, exist_ok=True)
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+    private_pem = key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption()
+    ).decode()
+    public_pem = key.public_key().public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode()
+
+    private_path = os.path.join(key_dir, "private.pem")
+    public_path = os.path.join(key_dir, "public.pem")
+    with open(private_path, "w") as f:
+        f.write(private_pem)
+    os.chmod(private_path, 0o600)
+    with open(public_path, "w") as f:
+        f.write(public_pem)
+
+    return private_path, public_path
+
+
+def read_key(path: str) -> str:
+    with open(path) as f:
+        return f.read()
+
+
+def backend_env(public_pem: str) -> Dict[str, str]:
+    """Environment variables that make the backend trust the local key"""
+    return {
+        "AUTH_TEST_MODE": "true",
+        "AUTH_TEST_PUBLIC_KEY": public_pem.strip().replace("\n", "\\n")
+    }
+
+
+def mint_token(private_pem: str, uid: str, ttl: int = 3600) -> str:
+    """Mint an ID token shaped like a Firebase one, signed by the local key"""
+    from jose import jwt
+
+    now = int(time.time())
+    claims = {
+        "iss": TOKEN_ISSUER,
+        "aud": TOKEN_AUDIENCE,
+        "sub": uid,
+        "iat": now,
+        "exp": now + ttl,
+        "email": f"{uid}@load-test.local",
+        "name": uid
+    }
+    return jwt.encode(claims, private_pem, algorithm="RS256")
+
+
+# ---------------------------------------------------------------------------
+# Synthetic canvases
+# ---------------------------------------------------------------------------
+
+def generate_canvas(rng: random.Random, width: int, height: int, strokes: int) -> bytes:
+    """
+    Draw random strokes on a transparent canvas and encode it as PNG,
+    like the Konva stage export from the frontend.
+    """
+    from PIL import Image, ImageDraw
+
+    image = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    scale = width / 600
+
+    for _ in range(strokes):
+        eraser = rng.random() < 0.05
+        color = "#FFFFFF" if eraser else rng.choice(PALETTE)
+        brush = rng.randint(1, 20) * (2 if eraser else 1)
+
+        x, y = rng.uniform(0, width), rng.uniform(0, height)
+        points = [(x, y)]
+        for _ in range(rng.randint(2, 40)):
+            x = min(max(x + rng.gauss(0, 15 * scale), 0), width - 1)
+            y = min(max(y + rng.gauss(0, 15 * scale), 0), height - 1)
+            points.append((x, y))
+
+        draw.line(points, fill=color, width=max(1, int(brush * scale)), joint="curve")
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def build_canvas_pool(count: int, seed: int, blank_fraction: float) -> List[Tuple[str, bytes]]:
+    """Pre-render canvases so drawing them does not skew client timing"""
+    rng = random.Random(seed)
+    pool = []
+    drawn = [name for name in COMPLEXITY_STROKES if name != "blank"]
+
+    for _ in range(count):
+        complexity = "blank" if rng.random() < blank_fraction else rng.choice(drawn)
+        width, height = rng.choice(CANVAS_SIZES)
+        low, high = COMPLEXITY_STROKES[complexity]
+        png = generate_canvas(rng, width, height, rng.randint(low, high))
+        pool.append((f"{complexity}-{width}x{height}", png))
+
+    return pool
+
+
+# ---------------------------------------------------------------------------
+# Open-loop driver
+# ---------------------------------------------------------------------------
+
+def arrival_times(rate: float, duration: float, arrivals: str, rng: random.Random) -> List[float]:
+    """Scheduled send offsets (seconds) for one stage"""
+    times = []
+    t = 0.0
+    while True:
+        t += rng.expovariate(rate) if arrivals == "poisson" else 1.0 / rate
+        if t >= duration:
+            return times
+        times.append(t)
+
+
+# Outcomes of a request: served at full quality, served degraded (below the
+# full tier or by the heuristic instead of the model), turned away as blank
+# as expected (422 "Insufficient drawing"), turned away by the scheduler's
+# rate limits or backpressure (429/503), or failed (other 4xx/5xx, timeouts,
+# connection errors)
+OUTCOMES = ("ok", "degraded", "blank", "rejected", "error")
+
+
+def classify(status: str, body: str = "", source: Optional[str] = None, tier: Optional[str] = None) -> str:
+    if status.startswith("2"):
+        if source == "heuristic" or tier not in (None, "full"):
+            return "degraded"
+        return "ok"
+    # Decided by the response, not the canvas label: the ink thresholds also
+    # reject some sparse canvases drawn as non-blank
+    if status == "422" and "Insufficient drawing" in body:
+        return "blank"
+    if status in ("429", "503"):
+        return "rejected"
+    return "error"
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def run_stage(
+    url: str,
+    endpoint: str,
+    rate: float,
+    duration: float,
+    tokens: List[str],
+    pool: List[Tuple[str, bytes]],
+    args
+) -> Dict:
+    """Drive one endpoint at a fixed request rate and summarize the results"""
+    import httpx
+
+    rng = random.Random(args.seed)
+    schedule = arrival_times(rate, duration, args.arrivals, rng)
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    outcomes = {outcome: 0 for outcome in OUTCOMES}
+    sources: Dict[str, int] = {}
+    tiers: Dict[str, int] = {}
+    params = {"detail": args.detail}
+    if args.priority:
+        params["priority"] = args.priority
+
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    async with httpx.AsyncClient(base_url=url, timeout=args.timeout, limits=limits) as client:
+
+        async def send(scheduled: float):
+            name, png = rng.choice(pool)
+            headers = {}
+            source = tier = None
+            body = ""
+            if tokens and rng.random() >= args.anonymous_fraction:
+                headers["Authorization"] = f"Bearer {rng.choice(tokens)}"
+            try:
+                response = await client.post(
+                    endpoint,
+                    params=params,
+                    headers=headers,
+                    files={"image": (f"{name}.png", png, "image/png")}
+                )
+                status = str(response.status_code)
+                source = response.headers.get("X-Prediction-Source")
+                tier = response.headers.get("X-Served-Tier")
+                if response.status_code == 422:
+                    body = response.text
+            except httpx.TimeoutException:
+                status = "timeout"
+            except httpx.HTTPError:
+                status = "connection_error"
+            # Measured from the scheduled time to include time spent waiting to send
+            outcome = classify(status, body, source, tier)
+            outcomes[outcome] += 1
+            if source is not None:
+                sources[source] = sources.get(source, 0) + 1
+            if tier is not None:
+                tiers[tier] = tiers.get(tier, 0) + 1
+            if outcome == "ok":
+                latencies.append(time.perf_counter() - scheduled)
+            statuses[status] = statuses.get(status, 0) + 1
+
+        started = time.perf_counter()
+        tasks = []
+        for offset in schedule:
+            delay = started + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(send(started + offset)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    total = len(schedule)
+    served = sum(sources.values())
+    return {
+        "endpoint": endpoint,
+        "offered_rps": rate,
+        "requests": total,
+        "achieved_rps": round(outcomes["ok"] / elapsed, 3) if elapsed > 0 else 0.0,
+        "error_rate": round(outcomes["error"] / total, 4) if total else 0.0,
+        "rejection_rate": round(outcomes["rejected"] / total, 4) if total else 0.0,
+        "blank_rate": round(outcomes["blank"] / total, 4) if total else 0.0,
+        "degraded_rate": round(outcomes["degraded"] / total, 4) if total else 0.0,
+        # Share of answered predictions that ran the model, rather than reusing
+        # a near-duplicate's result or falling back to the heuristic
+        "model_share": round(sources.get("model", 0) / served, 4) if served else None,
+        # Latency of full-quality responses only; rejections, blanks and
+        # degraded answers return almost instantly
+        "p50_ms": _ms(percentile(latencies, 50)),
+        "p90_ms": _ms(percentile(latencies, 90)),
+        "p99_ms": _ms(percentile(latencies, 99)),
+        "max_ms": _ms(max(latencies) if latencies else None),
+        "outcomes": outcomes,
+        "sources": sources,
+        "tiers": tiers,
+        "statuses": statuses
+    }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+def is_saturated(result: Dict, args) -> bool:
+    """
+    A stage is saturated when the server stops keeping up with the requests it
+    admits at full quality. Rate-limit and backpressure rejections and blank
+    canvases are reported separately and only reduce the rate the server is
+    expected to sustain; degraded answers count against it like errors.
+    """
+    if result["error_rate"] + result["degraded_rate"] > args.max_error_rate:
+        return True
+    admitted_rps = result["offered_rps"] * (1.0 - result["rejection_rate"] - result["blank_rate"])
+    if result["achieved_rps"] < 0.9 * admitted_rps:
+        return True
+    return result["p99_ms"] is not None and result["p99_ms"] > args.slo_p99_ms
+
+
+# ---------------------------------------------------------------------------
+# Server management
+# ---------------------------------------------------------------------------
+
+def capacity_env(args) -> Dict[str, str]:
+    """
+    Settings that make a spawned backend measure model capacity: no per-user
+    token buckets, no overload degradation and no near-duplicate reuse,
+    unless asked to keep them.
+    """
+    env = {}
+    if not args.keep_rate_limits:
+        env.update(UNLIMITED_RATE_ENV)
+    if not args.keep_degradation:
+        env.update(MODEL_ONLY_ENV)
+    return env
+
+
+def spawn_server(
+    workers: int,
+    concurrency: int,
+    port: int,
+    public_pem: str,
+    extra_env: List[str],
+    capacity_env: Optional[Dict[str, str]] = None
+) -> subprocess.Popen:
+    """Start the backend with uvicorn in auth test mode"""
+    env = dict(os.environ)
+    env.update(backend_env(public_pem))
+    env["INFERENCE_MAX_CONCURRENCY"] = str(concurrency)
+    env.update(capacity_env or {})
+    for item in extra_env:
+        key, _, value = item.partition("=")
+        env[key] = value
+
+    command = [
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--host", "127.0.0.1",
+        "--port", str(port),
+        "--workers", str(workers),
+        "--log-level", "warning"
+    ]
+    return subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+
+
+async def wait_ready(url: str, timeout: float):
+    """Poll /readyz until the model is loaded"""
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=url, timeout=2.0) as client:
+        while time.monotonic() < deadline:
+            try:
+                response = await client.get("/readyz")
+                if response.status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise TimeoutError(f"Server at {url} not ready after {timeout}s")
+
+
+def stop_server(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+# ---------------------------------------------------------------------------
+# Commands
+# ---------------------------------------------------------------------------
+
+def parse_list(value: str, cast=float) -> list:
+    return [cast(item) for item in value.split(",") if item.strip()]
+
+
+def cmd_keygen(args):
+    private_path, public_path = generate_keypair(args.key_dir)
+    print(f"Private key: {private_path}")
+    print(f"Public key:  {public_path}")
+    print("\nStart the backend with:")
+    for key, value in backend_env(read_key(public_path)).items():
+        print(f'{key}="{value}"')
+
+
+def cmd_token(args):
+    private_pem = read_key(os.path.join(args.key_dir, "private.pem"))
+    print(mint_token(private_pem, args.uid, ttl=args.ttl))
+
+
+async def sweep(args) -> List[Dict]:
+    private_path = os.path.join(args.key_dir, "private.pem")
+    public_path = os.path.join(args.key_dir, "public.pem")
+    if not os.path.exists(private_path):
+        generate_keypair(args.key_dir)
+    private_pem = read_key(private_path)
+
+    tokens = [mint_token(private_pem, f"load-user-{i}") for i in range(args.users)]
+    print(f"Rendering {args.pool_size} synthetic canvases...")
+    pool = build_canvas_pool(args.pool_size, args.seed, args.blank_fraction)
+
+    configurations = [(None, None)]
+    if args.spawn:
+        configurations = [
+            (workers, concurrency)
+            for workers in parse_list(args.workers, int)
+            for concurrency in parse_list(args.server_concurrency, int)
+        ]
+
+    results = []
+    for workers, concurrency in configurations:
+        url = args.url
+        process = None
+        if args.spawn:
+            url = f"http://127.0.0.1:{args.port}"
+            print(f"\nStarting server: workers={workers} inference_max_concurrency={concurrency}")
+            process = spawn_server(
+                workers, concurrency, args.port, read_key(public_path), args.server_env, capacity_env(args)
+            )
+
+        try:
+            await wait_ready(url, args.ready_timeout)
+            for endpoint in args.endpoint:
+                for rate in parse_list(args.rates):
+                    result = await run_stage(url, endpoint, rate, args.duration, tokens, pool, args)
+                    result["workers"] = workers
+                    result["server_concurrency"] = concurrency
+                    result["saturated"] = is_saturated(result, args)
+                    results.append(result)
+                    print_row(result)
+                    if result["saturated"] and args.stop_at_saturation:
+                        break
+                    await asyncio.sleep(args.cooldown)
+        finally:
+            if process is not None:
+                stop_server(process)
+
+    return results
+
+
+def print_row(result: Dict):
+    model_share = "-" if result["model_share"] is None else f"{result['model_share'] * 100:.1f}%"
+    print(
+        f"{result['endpoint']:<10} offered={result['offered_rps']:>7.2f}/s "
+        f"achieved={result['achieved_rps']:>7.2f}/s "
+        f"p50={result['p50_ms']}ms p99={result['p99_ms']}ms "
+        f"model={model_share} "
+        f"degraded={result['degraded_rate'] * 100:.1f}% "
+        f"rejected={result['rejection_rate'] * 100:.1f}% "
+        f"blank={result['blank_rate'] * 100:.1f}% "
+        f"errors={result['error_rate'] * 100:.1f}%"
+        f"{'  SATURATED' if result['saturated'] else ''}"
+    )
+
+
+def saturation_points(results: List[Dict]) -> List[Dict]:
+    """First saturated offered rate per server configuration and endpoint"""
+    points = {}
+    for result in results:
+        key = (result["workers"], result["server_concurrency"], result["endpoint"])
+        entry = points.setdefault(key, {
+            "workers": key[0],
+            "server_concurrency": key[1],
+            "endpoint": key[2],
+            "max_sustained_rps": None,
+            "saturation_rps": None
+        })
+        if result["saturated"]:
+            if entry["saturation_rps"] is None:
+                entry["saturation_rps"] = result["offered_rps"]
+        elif entry["saturation_rps"] is None:
+            entry["max_sustained_rps"] = result["offered_rps"]
+    return list(points.values())
+
+
+def write_results(results: List[Dict], path: str):
+    """Write JSON results plus a CSV of the latency-vs-throughput curve"""
+    summary = {"stages": results, "saturation": saturation_points(results)}
+    with open(path, "w") as f:
+        json.dump(summary, f, indent=2)
+
+    csv_path = os.path.splitext(path)[0] + ".csv"
+    columns = [
+        "workers", "server_concurrency", "endpoint", "offered_rps", "achieved_rps",
+        "p50_ms", "p90_ms", "p99_ms", "max_ms", "error_rate", "rejection_rate", "blank_rate", "degraded_rate", "model_share", "requests", "saturated"
+    ]
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(results)
+
+    print(f"\nResults written to {path} and {csv_path}")
+    for point in summary["saturation"]:
+        print(
+            f"workers={point['workers']} concurrency={point['server_concurrency']} {point['endpoint']}: "
+            f"max sustained {point['max_sustained_rps']}/s, saturated at {point['saturation_rps']}/s"
+        )
+
+
+def cmd_run(args):
+    results = asyncio.run(sweep(args))
+    write_results(results, args.output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load test for the Art Therapy backend")
+    parser.add_argument("--key-dir", default=DEFAULT_KEY_DIR, help="Directory holding the token signing keys")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("keygen", help="Create a signing key pair and print the backend settings")
+
+    token = subparsers.add_parser("token", help="Mint a single ID token")
+    token.add_argument("--uid", default="load-user-0")
+    token.add_argument("--ttl", type=int, default=3600)
+
+    run = subparsers.add_parser("run", help="Run a request-rate sweep")
+    run.add_argument("--url", default="http://127.0.0.1:8000", help="Backend URL (ignored with --spawn)")
+    run.add_argument("--endpoint", action="append", default=None, help="Endpoint to drive; repeat for several")
+    run.add_argument("--rates", default="0.5,1,2,4,8", help="Comma-separated offered request rates (req/s)")
+    run.add_argument("--duration", type=float, default=30.0, help="Seconds per rate stage")
+    run.add_argument("--cooldown", type=float, default=5.0, help="Seconds to idle between stages")
+    run.add_argument("--arrivals", choices=["poisson", "uniform"], default="poisson")
+    run.add_argument("--users", type=int, default=20, help="Number of distinct authenticated users")
+    run.add_argument("--anonymous-fraction", type=float, default=0.2)
+    run.add_argument("--priority", default=None, help="Priority class for authenticated requests, e.g. batch")
+    run.add_argument("--detail", default="full", choices=["none", "scores", "full"])
+    run.add_argument("--pool-size", type=int, default=64, help="Number of distinct synthetic canvases")
+    run.add_argument("--blank-fraction", type=float, default=0.1, help="Share of blank canvases; canvases rejected as blank are reported separately, not as errors")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    run.add_argument("--max-connections", type=int, default=1000)
+    run.add_argument("--slo-p99-ms", type=float, default=2000.0, help="p99 latency above which a stage counts as saturated")
+    run.add_argument("--max-error-rate", type=float, default=0.01, help="Error rate (excluding 429/503 rejections) above which a stage counts as saturated")
+    run.add_argument("--stop-at-saturation", action="store_true", help="Skip higher rates once saturated")
+    run.add_argument("--spawn", action="store_true", help="Start the backend locally for each configuration")
+    run.add_argument("--workers", default="1", help="Comma-separated uvicorn worker counts (with --spawn)")
+    run.add_argument("--server-concurrency", default="1", help="Comma-separated INFERENCE_MAX_CONCURRENCY values (with --spawn)")
+    run.add_argument("--server-env", action="append", default=[], help="Extra KEY=VALUE for the spawned backend")
+    run.add_argument("--keep-rate-limits", action="store_true", help="Keep the spawned backend's per-user rate limits")
+    run.add_argument(
+        "--keep-degradation",
+        action="store_true",
+        help="Keep overload degradation and near-duplicate reuse enabled on the spawned backend"
+    )
+    run.add_argument("--port", type=int, default=8765)
+    run.add_argument("--ready-timeout", type=float, default=300.0)
+    run.add_argument("--output", default="load_test_results.json")
+
+    args = parser.parse_args()
+    if args.command == "keygen":
+        cmd_keygen(args)
+    elif args.command == "token":
+        cmd_token(args)
+    else:
+        args.endpoint = args.endpoint or ["/predict"]
+        cmd_run(args)
+
+
+if __name__ == "__main__":
+    main()
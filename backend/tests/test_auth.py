@@ -0,0 +1,83 @@
+import asyncio
+import time
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+jwt = pytest.importorskip("jose.jwt")
+
+import load_test
+from app import auth
+from app.config import settings
+
+@pytest.fixture(scope="module")
+def keys(tmp_path_factory):
+    """Signing key pair plus an unrelated private key"""
+    private_path, public_path = load_test.generate_keypair(str(tmp_path_factory.mktemp("keys")))
+    other_private_path, _ = load_test.generate_keypair(str(tmp_path_factory.mktemp("other")))
+    return (
+        load_test.read_key(private_path),
+        load_test.read_key(public_path),
+        load_test.read_key(other_private_path)
+    )
+
+@pytest.fixture
+def test_mode(keys, monkeypatch):
+    """Enable auth test mode trusting the generated public key"""
+    _, public_pem, _ = keys
+    monkeypatch.setattr(settings, "auth_test_mode", True)
+    monkeypatch.setattr(settings, "auth_test_public_key", public_pem.strip().replace("\n", "\\n"))
+    return keys
+
+def sign(private_pem, **overrides):
+    """Sign a token like load_test.mint_token, with some claims overridden"""
+    now = int(time.time())
+    claims = {
+        "iss": settings.auth_test_issuer,
+        "aud": settings.auth_test_audience,
+        "sub": "load-user-1",
+        "iat": now,
+        "exp": now + 3600
+    }
+    claims.update(overrides)
+    return jwt.encode(claims, private_pem, algorithm="RS256")
+
+def current_user(token):
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    return asyncio.run(auth.get_current_user(credentials))
+
+def test_valid_token(test_mode):
+    """Test a token minted by the load test harness is trusted"""
+    private_pem, _, _ = test_mode
+    claims = auth.verify_id_token(load_test.mint_token(private_pem, "alice"))
+    assert claims["uid"] == claims["sub"] == "alice"
+    assert current_user(load_test.mint_token(private_pem, "alice")).uid == "alice"
+
+def test_expired_token(test_mode):
+    """Test an expired token is rejected as expired"""
+    private_pem, _, _ = test_mode
+    token = sign(private_pem, iat=int(time.time()) - 7200, exp=int(time.time()) - 3600)
+    with pytest.raises(HTTPException) as excinfo:
+        current_user(token)
+    assert excinfo.value.status_code == 401
+    assert "expired" in excinfo.value.detail
+
+@pytest.mark.parametrize("claim", [{"aud": "someone-else"}, {"iss": "someone-else"}])
+def test_wrong_audience_or_issuer(test_mode, claim):
+    """Test tokens for another audience or issuer are rejected"""
+    private_pem, _, _ = test_mode
+    with pytest.raises(auth.InvalidTokenError):
+        auth.verify_id_token(sign(private_pem, **claim))
+    with pytest.raises(HTTPException) as excinfo:
+        current_user(sign(private_pem, **claim))
+    assert excinfo.value.detail == "Invalid authentication token"
+
+def test_token_signed_with_other_key(test_mode):
+    """Test a token signed by an untrusted key is rejected"""
+    _, _, other_private_pem = test_mode
+    token = load_test.mint_token(other_private_pem, "mallory")
+    with pytest.raises(auth.InvalidTokenError):
+        auth.verify_id_token(token)
+    with pytest.raises(HTTPException) as excinfo:
+        current_user(token)
+    assert excinfo.value.status_code == 401
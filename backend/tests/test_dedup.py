@@ -0,0 +1,110 @@
+import io
+import numpy as np
+from PIL import Image, ImageDraw
+
+from app.config import settings
+from app.dedup import NearDuplicateIndex, HASH_BITS
+from app import ingest
+from app.ingest import ingest_canvas
+
+def render(draw_fn):
+    """Render a drawing on a white 600x400 canvas as PNG"""
+    img = Image.new('RGB', (600, 400), 'white')
+    draw_fn(ImageDraw.Draw(img))
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def draw_canvas(extra_stroke=None, colours=('#0000FF', '#FF0000')):
+    """Render a simple drawing as PNG, optionally with one more stroke"""
+    def draw_fn(draw):
+        draw.line([(100, 100), (300, 250), (500, 120)], fill=colours[0], width=8)
+        draw.ellipse([200, 150, 320, 270], outline=colours[1], width=5)
+        if extra_stroke:
+            draw.line(extra_stroke, fill='#000000', width=3)
+    return render(draw_fn)
+
+def draw_face(smile):
+    """A small face in the middle of the canvas, smiling or frowning"""
+    def draw_fn(draw):
+        draw.ellipse([250, 150, 350, 250], outline='#000000', width=4)
+        draw.ellipse([275, 180, 285, 190], fill='#000000')
+        draw.ellipse([315, 180, 325, 190], fill='#000000')
+        if smile:
+            draw.arc([275, 195, 325, 235], 20, 160, fill='#000000', width=4)
+        else:
+            draw.arc([275, 215, 325, 255], 200, 340, fill='#000000', width=4)
+    return render(draw_fn)
+
+def draw_square(colour):
+    return render(lambda draw: draw.rectangle([280, 180, 320, 220], fill=colour))
+
+def distance(a, b):
+    return (ingest_canvas(a).phash ^ ingest_canvas(b).phash).bit_count()
+
+def test_hash_size():
+    """Test the index is sized for the canvas hash"""
+    assert HASH_BITS == ingest.HASH_BITS
+    assert ingest_canvas(draw_canvas()).phash.bit_length() <= HASH_BITS
+
+def test_similar_drawings_have_close_hashes():
+    """Test one extra stroke only flips a few hash bits"""
+    # Inside the drawing
+    assert distance(draw_canvas(), draw_canvas([(220, 200), (250, 210)])) <= settings.dedup_max_distance
+    # Outside it, which reframes the drawing slightly
+    assert distance(draw_canvas(), draw_canvas([(400, 300), (430, 310)])) <= settings.overload_fallback_distance
+
+def test_different_drawings_have_distant_hashes():
+    """Test different drawings on the same spot of the canvas are not near-duplicates"""
+    threshold = max(settings.dedup_max_distance, settings.overload_fallback_distance)
+    assert distance(draw_face(smile=True), draw_face(smile=False)) > threshold
+    # Same shapes, different colours
+    assert distance(draw_square('#FF0000'), draw_square('#0000FF')) > threshold
+    assert distance(draw_canvas(), draw_canvas(colours=('#FF0000', '#0000FF'))) > threshold
+
+def test_lookup_within_distance():
+    """Test lookups find entries within the distance and scope them per user"""
+    index = NearDuplicateIndex(max_distance=4, max_entries=100)
+    phash = 0x0123456789ABCDEF
+    index.add("alice", phash, embedding=None, scores={"Calm": 0.3})
+
+    match = index.lookup("alice", phash ^ 0b1011)
+    assert match is not None
+    assert match.distance == 3
+    assert match.entry.scores == {"Calm": 0.3}
+
+    # Too far, or another user's drawing
+    assert index.lookup("alice", phash ^ 0b11111) is None
+    assert index.lookup("bob", phash) is None
+
+    stats = index.stats()
+    assert stats["lookups"] == 3
+    assert stats["hits"] == 1
+    assert stats["hits_by_distance"] == {"3": 1}
+
+def test_lookup_spread_across_chunks():
+    """Test a match whose differing bits fall in every chunk is still found"""
+    index = NearDuplicateIndex(max_distance=7, max_entries=100, chunks=4)
+    phash = int.from_bytes(bytes(range(HASH_BITS // 8)), "big")
+    index.add("alice", phash, embedding=None, scores={})
+
+    # Two bits in each of the first three chunks, one in the last
+    flipped = phash
+    for chunk, count in enumerate([2, 2, 2, 1]):
+        for bit in range(count):
+            flipped ^= 1 << (chunk * index.chunk_bits + bit)
+    match = index.lookup("alice", flipped)
+    assert match is not None
+    assert match.distance == 7
+
+def test_eviction():
+    """Test the index stays within max_entries, evicting least recently used"""
+    index = NearDuplicateIndex(max_distance=0, max_entries=2)
+    index.add("alice", 1, embedding=None, scores={})
+    index.add("alice", 2, embedding=None, scores={})
+    assert index.lookup("alice", 1) is not None
+
+    index.add("alice", 3, embedding=None, scores={})
+    assert index.lookup("alice", 2) is None
+    assert index.lookup("alice", 1) is not None
+    assert index.stats()["evictions"] == 1
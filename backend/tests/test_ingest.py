@@ -0,0 +1,42 @@
+import io
+import numpy as np
+from PIL import Image
+
+from app.ingest import ingest_canvas, decode_canvas
+
+def encode_png(img, mode=None):
+    """Encode a numpy array as PNG bytes"""
+    buffer = io.BytesIO()
+    Image.fromarray(img, mode=mode).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def test_blank_canvas():
+    """Test an empty white canvas is flagged as blank"""
+    img = np.full((400, 600, 3), 255, dtype=np.uint8)
+    result = ingest_canvas(encode_png(img))
+    assert result.blank
+    assert result.ink_coverage == 0.0
+    assert result.bbox is None
+
+def test_transparent_canvas_is_white():
+    """Test transparent pixels are composited onto white, not black"""
+    img = np.zeros((40, 60, 4), dtype=np.uint8)
+    img[10:20, 10:20] = [255, 0, 0, 255]
+    decoded = decode_canvas(encode_png(img, mode='RGBA'))
+    assert decoded.shape == (40, 60, 3)
+    assert tuple(decoded[0, 0]) == (255, 255, 255)
+    assert tuple(decoded[15, 15]) == (255, 0, 0)
+
+def test_crop_to_inked_region():
+    """Test the canvas is cropped to the drawing with a margin and made square"""
+    img = np.full((400, 600, 3), 255, dtype=np.uint8)
+    img[100:200, 300:350] = [0, 0, 255]
+    result = ingest_canvas(encode_png(img))
+
+    assert not result.blank
+    assert result.bbox == (300, 100, 350, 200)
+    assert result.ink_pixels == 100 * 50
+
+    # 100px tall drawing + 10% margin on each side, padded to a square
+    assert result.image.shape == (120, 120, 3)
+    assert np.count_nonzero((result.image == [0, 0, 255]).all(axis=2)) == 100 * 50
@@ -5,9 +5,15 @@ import io
 import numpy as np
 
 from app.main import app
+from app.model_loader import get_model_loader, ModelState
 
 client = TestClient(app)
 
+@pytest.fixture(scope="module")
+def model():
+    """Load the model up front: /predict answers 503 until it is ready"""
+    return get_model_loader().load()
+
 def create_test_image():
     """Create a simple test image"""
     # Create a 100x100 RGB image with some colors
@@ -39,6 +45,22 @@ def test_health():
     assert "services" in data
     assert "timestamp" in data
 
+def test_livez():
+    """Test the liveness probe answers without waiting for the model"""
+    response = client.get("/livez")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "alive"
+    assert data["import_seconds"] >= 0
+
+def test_readyz():
+    """Test the readiness probe reports the model loading state"""
+    response = client.get("/readyz")
+    assert response.status_code in (200, 503)
+    data = response.json()
+    assert data["model"]["ready"] == (response.status_code == 200)
+    assert data["model"]["state"] in ["pending", "importing", "loading", "warming_up", "ready", "failed"]
+
 def test_get_moods():
     """Test the moods endpoint"""
     response = client.get("/moods")
@@ -54,7 +76,7 @@ def test_get_moods():
     assert "Anxious" in data["moods"]
     assert "Excited" in data["moods"]
 
-def test_predict_mood():
+def test_predict_mood(model):
     """Test mood prediction with a test image"""
     test_image = create_test_image()
     
@@ -80,6 +102,41 @@ def test_predict_mood():
     # Check analysis details structure
     details = data["analysis_details"]
     assert "method" in details
+    
+    # Check the quality tier is reported
+    assert data["served_tier"] == response.headers["X-Served-Tier"]
+
+def test_predict_mood_detail_levels(model):
+    """Test the detail query parameter controls the analysis details"""
+    response = client.post(
+        "/predict?detail=none",
+        files={"image": ("test.png", create_test_image(), "image/png")}
+    )
+    assert response.status_code == 200
+    assert response.json()["analysis_details"] is None
+    
+    response = client.post(
+        "/predict?detail=scores",
+        files={"image": ("test.png", create_test_image(), "image/png")}
+    )
+    assert response.status_code == 200
+    details = response.json()["analysis_details"]
+    assert list(details.keys()) == ["all_scores"]
+    assert len(details["all_scores"]) == 6
+
+def test_predict_mood_msgpack(model):
+    """Test MessagePack responses via content negotiation"""
+    msgpack = pytest.importorskip("msgpack")
+    
+    response = client.post(
+        "/predict",
+        files={"image": ("test.png", create_test_image(), "image/png")},
+        headers={"Accept": "application/msgpack"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/msgpack"
+    data = msgpack.unpackb(response.content)
+    assert data["mood"] in ["Happy", "Sad", "Calm", "Angry", "Anxious", "Excited"]
 
 def test_predict_mood_invalid_file():
     """Test mood prediction with invalid file type"""
@@ -94,6 +151,77 @@ def test_predict_mood_invalid_file():
     assert response.status_code == 400
     assert "File must be an image" in response.json()["detail"]
 
+def test_predict_mood_blank_canvas():
+    """Test a blank canvas is rejected without running the model"""
+    img = np.full((400, 600, 3), 255, dtype=np.uint8)
+    img_byte_arr = io.BytesIO()
+    Image.fromarray(img).save(img_byte_arr, format='PNG')
+    img_byte_arr.seek(0)
+    
+    response = client.post(
+        "/predict",
+        files={"image": ("blank.png", img_byte_arr, "image/png")}
+    )
+    
+    assert response.status_code == 422
+    assert "Insufficient drawing" in response.json()["detail"]
+
+def test_predict_mood_heuristic_without_model(monkeypatch):
+    """Test the heuristic tier answers without waiting for the model"""
+    from app.overload import get_overload_controller, ServiceTier
+    
+    def model_unavailable():
+        raise AssertionError("model should not be loaded")
+    
+    monkeypatch.setattr(get_model_loader(), "require", model_unavailable)
+    monkeypatch.setattr(get_overload_controller(), "tier", lambda: ServiceTier.CACHED_OR_HEURISTIC)
+    
+    response = client.post(
+        "/predict",
+        files={"image": ("test.png", create_test_image(), "image/png")}
+    )
+    
+    assert response.status_code == 200
+    assert response.headers["X-Prediction-Source"] == "heuristic"
+    data = response.json()
+    assert data["mood"] in ["Happy", "Sad", "Calm", "Angry", "Anxious", "Excited"]
+    assert data["analysis_details"] is None
+
+def test_resolve_priority_class(monkeypatch):
+    """Test authenticated callers may opt down to a lower class but never up"""
+    from fastapi import HTTPException
+    from app.main import resolve_priority_class
+    from app.models import User
+    from app.scheduler import get_inference_scheduler, PriorityClass
+    
+    classes = get_inference_scheduler().classes
+    monkeypatch.setitem(classes, "realtime", PriorityClass("realtime", weight=classes["interactive"].weight + 1))
+    user = User(uid="alice")
+    
+    assert resolve_priority_class(None, "realtime") == "anonymous"
+    assert resolve_priority_class(user, "interactive") == "interactive"
+    assert resolve_priority_class(user, "batch") == "batch"
+    for requested in ["realtime", "anonymous", "unknown"]:
+        with pytest.raises(HTTPException) as excinfo:
+            resolve_priority_class(user, requested)
+        assert excinfo.value.status_code == 400
+
+def test_predict_mood_model_not_ready(monkeypatch):
+    """Test /predict fails fast with 503 while the model is unavailable"""
+    loader = get_model_loader()
+    monkeypatch.setattr(loader, "_analyzer", None)
+    monkeypatch.setattr(loader, "state", ModelState.FAILED)
+    monkeypatch.setattr(loader, "start_background", lambda: None)
+    
+    response = client.post(
+        "/predict",
+        files={"image": ("test.png", create_test_image(), "image/png")}
+    )
+    
+    assert response.status_code == 503
+    assert "not ready" in response.json()["detail"]
+    assert int(response.headers["Retry-After"]) >= 1
+
 def test_predict_mood_no_file():
     """Test mood prediction without uploading a file"""
     response = client.post("/predict")
@@ -0,0 +1,47 @@
+import asyncio
+import pytest
+
+from app.config import settings
+from app.model_loader import ModelLoader, ModelNotReady, ModelState
+
+def test_get_fails_fast_before_load():
+    """Test get() raises instead of loading the model on the caller's thread"""
+    loader = ModelLoader()
+    with pytest.raises(ModelNotReady) as excinfo:
+        loader.get()
+    assert excinfo.value.state == ModelState.PENDING
+    assert excinfo.value.retry_after > 0
+
+def test_background_load_retries_with_backoff(monkeypatch):
+    """Test a failed load is retried by the background task with growing delays"""
+    monkeypatch.setattr(settings, "model_load_retry_initial", 0.01)
+    monkeypatch.setattr(settings, "model_load_retry_max", 0.02)
+    loader = ModelLoader()
+    analyzer = object()
+    delays = []
+    sleep = asyncio.sleep
+
+    def load():
+        if loader.attempts < 3:
+            loader.state = ModelState.FAILED
+            raise RuntimeError("download failed")
+        loader._analyzer = analyzer
+        loader.state = ModelState.READY
+        return analyzer
+
+    async def record_sleep(delay):
+        delays.append(delay)
+        await sleep(0)
+
+    monkeypatch.setattr(loader, "load", load)
+    monkeypatch.setattr(asyncio, "sleep", record_sleep)
+
+    async def main():
+        loader.start_background()
+        loader.start_background()
+        await loader._task
+
+    asyncio.run(main())
+    assert loader.attempts == 3
+    assert delays == [0.01, 0.02]
+    assert loader.get() is analyzer
@@ -0,0 +1,70 @@
+import numpy as np
+
+from app.overload import OverloadController, ServiceTier
+from app.heuristics import heuristic_scores
+
+def make_controller(depth):
+    return OverloadController(
+        lambda: depth[0],
+        slo_p99_ms=1000.0,
+        queue_high=8,
+        queue_low=2,
+        escalate_interval=1.0,
+        recover_interval=10.0,
+        latency_window=30.0
+    )
+
+def test_escalates_one_tier_per_interval():
+    """Test a deep queue moves up one tier at a time"""
+    depth = [20]
+    controller = make_controller(depth)
+
+    assert controller.tier(now=100.0) == ServiceTier.NO_DETAILS
+    assert controller.tier(now=100.5) == ServiceTier.NO_DETAILS
+    assert controller.tier(now=101.0) == ServiceTier.SHORT_QUEUE
+    for t in range(102, 110):
+        tier = controller.tier(now=float(t))
+    assert tier == ServiceTier.CACHED_OR_HEURISTIC
+
+def test_escalates_on_latency():
+    """Test p99 latency above the SLO escalates even with a short queue"""
+    depth = [0]
+    controller = make_controller(depth)
+    for _ in range(50):
+        controller.observe(2.0, now=100.0)
+    assert controller.tier(now=100.0) == ServiceTier.NO_DETAILS
+
+def test_recovers_with_hysteresis():
+    """Test the controller only steps down after staying calm for the recover interval"""
+    depth = [20]
+    controller = make_controller(depth)
+    controller.tier(now=100.0)
+    controller.tier(now=101.0)
+    assert controller.tier(now=101.0) == ServiceTier.SHORT_QUEUE
+
+    # Between the watermarks: neither overloaded nor calm, so no change
+    depth[0] = 5
+    assert controller.tier(now=120.0) == ServiceTier.SHORT_QUEUE
+
+    depth[0] = 0
+    assert controller.tier(now=121.0) == ServiceTier.SHORT_QUEUE
+    assert controller.tier(now=125.0) == ServiceTier.SHORT_QUEUE
+    assert controller.tier(now=131.0) == ServiceTier.NO_DETAILS
+    assert controller.tier(now=141.0) == ServiceTier.FULL
+
+    status = controller.status()
+    assert status["tier"] == "full"
+    assert status["transitions"] == 4
+
+def test_heuristic_scores():
+    """Test the heuristic fallback covers all moods and follows colour cues"""
+    bright = np.zeros((64, 64, 3), dtype=np.uint8)
+    bright[:] = [255, 200, 0]
+    dark = np.full((64, 64, 3), 30, dtype=np.uint8)
+
+    bright_scores = heuristic_scores(bright)
+    dark_scores = heuristic_scores(dark)
+    assert set(bright_scores) == {"Happy", "Sad", "Calm", "Angry", "Anxious", "Excited"}
+    assert max(bright_scores, key=bright_scores.get) in ("Happy", "Excited")
+    assert max(dark_scores, key=dark_scores.get) == "Sad"
+    assert all(0.0 <= score <= 1.0 for score in bright_scores.values())
@@ -0,0 +1,137 @@
+import asyncio
+import time
+import pytest
+
+from app.scheduler import FairScheduler, PriorityClass, RateLimited, QueueFull, TokenBucket
+
+def make_scheduler(**kwargs):
+    classes = [
+        PriorityClass("interactive", weight=4, max_concurrency=1, rate=1000.0, burst=1000),
+        PriorityClass("batch", weight=1, max_concurrency=1, rate=1000.0, burst=1000),
+        PriorityClass("anonymous", weight=1, max_concurrency=1, rate=1000.0, burst=1000)
+    ]
+    return FairScheduler(classes, **kwargs)
+
+async def run_jobs(scheduler, jobs):
+    """Queue all jobs behind a blocker, then record the order they are served in"""
+    order = []
+
+    async def job(user_key, class_name):
+        async with scheduler.slot(user_key, class_name):
+            order.append((user_key, class_name))
+            await asyncio.sleep(0)
+
+    blocker = asyncio.Event()
+
+    async def hold():
+        async with scheduler.slot("blocker", "interactive"):
+            await blocker.wait()
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    tasks = [asyncio.create_task(job(u, c)) for u, c in jobs]
+    await asyncio.sleep(0)
+    blocker.set()
+    await asyncio.gather(holder, *tasks)
+    return order
+
+def test_token_bucket():
+    """Test the token bucket refills at its rate"""
+    bucket = TokenBucket(rate=1.0, capacity=2)
+    now = bucket.updated
+    assert bucket.try_acquire(now)
+    assert bucket.try_acquire(now)
+    assert not bucket.try_acquire(now)
+    assert bucket.try_acquire(now + 1.0)
+
+def test_idle_buckets_evicted():
+    """Test refilled buckets are dropped and the bucket count is bounded"""
+    classes = [PriorityClass("interactive", weight=1, rate=1.0, burst=2)]
+    scheduler = FairScheduler(classes, max_buckets=3)
+    start = time.monotonic()
+
+    def use(user, offset):
+        return scheduler._bucket("interactive", user, now=start + offset).try_acquire(start + offset)
+
+    assert use("a", 0.0)
+    assert use("b", 0.5)
+    assert len(scheduler._buckets) == 2
+
+    # "a" has refilled by now and is dropped; "b" is still draining
+    use("c", 1.2)
+    assert ("interactive", "a") not in scheduler._buckets
+    assert ("interactive", "b") in scheduler._buckets
+
+    # Busy users beyond max_buckets push out the least recently used
+    for user in ["d", "e", "f"]:
+        use(user, 1.3)
+    assert len(scheduler._buckets) == 3
+    assert ("interactive", "b") not in scheduler._buckets
+
+def test_round_robin_between_users():
+    """Test a heavy user cannot starve a light user in the same class"""
+    scheduler = make_scheduler(max_concurrency=1)
+    jobs = [("heavy", "interactive")] * 5 + [("light", "interactive")]
+    order = asyncio.run(run_jobs(scheduler, jobs))
+
+    # The light user is served right after the heavy user's first request
+    assert order.index(("light", "interactive")) == 1
+
+def test_weighted_classes():
+    """Test classes are served in proportion to their weights"""
+    scheduler = make_scheduler(max_concurrency=1)
+    jobs = [("bulk", "batch")] * 10 + [(f"user{i}", "interactive") for i in range(10)]
+    order = asyncio.run(run_jobs(scheduler, jobs))
+
+    first_ten = [class_name for _, class_name in order[:10]]
+    assert first_ten.count("interactive") >= 7
+
+def test_class_concurrency_cap():
+    """Test a class never exceeds its concurrency cap"""
+    scheduler = make_scheduler(max_concurrency=3)
+    peak = 0
+
+    async def main():
+        nonlocal peak
+
+        async def job():
+            nonlocal peak
+            async with scheduler.slot("anonymous", "anonymous"):
+                peak = max(peak, scheduler._running["anonymous"])
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(job() for _ in range(5)))
+
+    asyncio.run(main())
+    assert peak == 1
+
+def test_rate_limit_and_queue_bound():
+    """Test admission is refused when the bucket or the queue is exhausted"""
+    classes = [PriorityClass("anonymous", weight=1, max_concurrency=1, rate=0.0, burst=1)]
+    scheduler = FairScheduler(classes, max_concurrency=1)
+
+    async def main():
+        async with scheduler.slot("anonymous", "anonymous"):
+            pass
+        with pytest.raises(RateLimited):
+            await scheduler.acquire("anonymous", "anonymous")
+
+    asyncio.run(main())
+
+    classes = [PriorityClass("interactive", weight=1, max_concurrency=1, rate=1000.0, burst=1000)]
+    scheduler = FairScheduler(classes, max_concurrency=1, max_queue_per_user=1)
+
+    async def fill():
+        await scheduler.acquire("a", "interactive")
+        waiting = asyncio.create_task(scheduler.acquire("a", "interactive"))
+        await asyncio.sleep(0)
+        with pytest.raises(QueueFull):
+            await scheduler.acquire("a", "interactive")
+        scheduler.release("interactive")
+        await waiting
+        scheduler.release("interactive")
+
+    asyncio.run(fill())
+    snapshot = scheduler.snapshot()
+    assert snapshot["active"] == 0
+    assert snapshot["classes"]["interactive"]["rejected"] == 1